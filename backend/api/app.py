@@ -1,24 +1,51 @@
 # backend/api/app_sqlite.py
 
-from flask import Flask, jsonify, request
+from flask import Flask, request
 from flask_cors import CORS
 import os
-import json
-import pandas as pd
+import functools
+import gzip
+import hashlib
+import csv
+import orjson
 import sqlite3
 import logging
-import math
+import logging.handlers
+import queue
+import re
+import atexit
+import threading
 from job_manager import job_manager
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Configure logging
-logging.basicConfig(
-    filename='../logs/backend.log',
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s:%(message)s'
-)
+# Configure logging: request threads only enqueue records, a background
+# listener thread formats them and writes the log file (and console)
+LOG_DIR = '../logs'
+LOG_QUEUE = queue.SimpleQueue()
+
+os.makedirs(LOG_DIR, exist_ok=True)
+_file_handler = logging.FileHandler(os.path.join(LOG_DIR, 'backend.log'))
+_file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s:%(message)s'))
+
+_root_logger = logging.getLogger()
+_root_logger.setLevel(logging.INFO)
+# Keep the console handler installed by job_manager's basicConfig
+LOG_HANDLERS = tuple(_root_logger.handlers) + (_file_handler,)
+_root_logger.handlers = [logging.handlers.QueueHandler(LOG_QUEUE)]
+
+_log_listener = None
+
+def start_log_listener():
+    """(Re)start the log writer thread; gunicorn calls this after forking a worker."""
+    global _log_listener
+    _log_listener = logging.handlers.QueueListener(LOG_QUEUE, *LOG_HANDLERS, respect_handler_level=True)
+    _log_listener.start()
+
+start_log_listener()
+# Flush queued records on shutdown
+atexit.register(lambda: _log_listener.stop())
 
 DATA_DIR = '../data'
 DB_PATH = os.path.join(DATA_DIR, 'stocks.db')
@@ -91,61 +118,377 @@ FIELD_MAP = {
 # Reverse mapping for query building
 JSON_TO_DB_MAP = {v: k for k, v in FIELD_MAP.items()}
 
+# Explicit column order for stock_indicators SELECTs; rows are mapped to JSON names by position
+DB_COLUMNS = tuple(FIELD_MAP) + ('last_calculated',)
+JSON_KEYS = tuple(FIELD_MAP.get(col, col) for col in DB_COLUMNS)
+SELECT_COLUMNS = ', '.join(DB_COLUMNS)
+TEXT_COLUMN_INDEXES = tuple(DB_COLUMNS.index(col) for col in ('symbol', 'date', 'last_calculated'))
+
+# In-process caches for static files, invalidated when the file's mtime changes
+_CACHE_LOCK = threading.Lock()
+_CONFIG_CACHE = {'mtime': None, 'value': None}
+_SP500_CACHE = {'mtime': None, 'value': None, 'json_bytes': None}
+
+# Pre-serialized payload for the unfiltered /api/stock-all-data scan, invalidated on DB writes
+_ALL_CACHE_LOCK = threading.Lock()
+_ALL_CACHE = {'version': None, 'count': 0, 'json_bytes': None}
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+def ojsonify(obj, status=200):
+    """Serialize obj with orjson into a JSON response (NaN/Infinity become null)."""
+    return app.response_class(orjson.dumps(obj, option=ORJSON_OPTIONS), status=status, mimetype='application/json')
+
+def make_etag(version):
+    """Build a strong ETag from any repr()-able version token (mtimes, query args...)."""
+    return hashlib.blake2b(repr(version).encode('utf-8'), digest_size=16).hexdigest()
+
+# Content-coding suffix that gzip_response or a proxy may append to an ETag ("<tag>-gzip")
+ETAG_ENCODING_SUFFIX_RE = re.compile(r'[-;](?:gzip|br|deflate|zstd)$')
+
+def if_none_match_contains(etag):
+    """
+    True if the request's If-None-Match names etag in any representation:
+    W/ weak prefixes and content-coding suffixes are ignored.
+    """
+    tags = request.if_none_match
+    if tags.star_tag:
+        return True
+    return any(ETAG_ENCODING_SUFFIX_RE.sub('', tag) == etag for tag in tags.as_set(include_weak=True))
+
+def etag_cached(version_fn, cache_control='public, max-age=60'):
+    """
+    Decorator for GET endpoints whose output only changes when version_fn() changes.
+    Answers 304 Not Modified when the client's If-None-Match matches, otherwise
+    tags successful responses with ETag and Cache-Control headers.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                etag = make_etag(version_fn())
+            except OSError:
+                # Source file missing: skip conditional handling
+                return view(*args, **kwargs)
+
+            # Tags weakened or suffixed for the gzip representation still match
+            if if_none_match_contains(etag):
+                response = app.response_class(status=304)
+            else:
+                response = view(*args, **kwargs)
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
+
+# gzip settings for JSON responses (JSON typically compresses 8-10x)
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_LEVEL = 4
+
+@app.after_request
+def gzip_response(response):
+    """gzip buffered JSON responses when the client accepts it."""
+    if response.mimetype != 'application/json':
+        return response
+    # Compressed or not, the body depends on Accept-Encoding, so shared caches
+    # must key on it for every JSON response
+    response.vary.add('Accept-Encoding')
+
+    # accept_encodings honours q-values: "gzip;q=0" refuses gzip
+    if (response.status_code != 200 or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not request.accept_encodings['gzip']):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0))
+    response.headers['Content-Encoding'] = 'gzip'
+
+    # The compressed body is a different representation of the same resource
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+def config_version():
+    return (INDICATORS_CONFIG, os.stat(INDICATORS_CONFIG).st_mtime_ns)
+
+def sp500_version():
+    return (SP500_CSV, os.stat(SP500_CSV).st_mtime_ns)
+
+def stock_data_version():
+    # Presets resolve through the config file, so its mtime is part of the version
+    return (get_db_version(), config_version(), sorted(request.args.items(multi=True)))
+
+# One SQLite connection per thread. gunicorn's gthread workers serve requests
+# from a fixed thread pool, so gunicorn.conf.py sets PERSISTENT_DB_CONNECTIONS
+# and each connection is reused across requests. The Werkzeug dev server starts
+# a new thread for every request, so there the connection is closed at teardown.
+_tls = threading.local()
+_open_connections = set()
+_open_connections_lock = threading.Lock()
+app.config.setdefault('PERSISTENT_DB_CONNECTIONS', False)
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+)
+
 def get_db_connection():
-    """Get SQLite database connection with proper row factory."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """
+    Get this thread's SQLite connection with proper row factory.
+    With PERSISTENT_DB_CONNECTIONS the connection is reused across requests so
+    sqlite3's statement cache survives; it is reopened if stocks.db is replaced.
+    """
+    try:
+        db_inode = os.stat(DB_PATH).st_ino
+    except FileNotFoundError:
+        db_inode = None
+
+    conn = getattr(_tls, 'conn', None)
+    if conn is not None and _tls.inode == db_inode:
+        return conn
+    if conn is not None:
+        close_db_connection()
+
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    # Plain tuples are cheaper than sqlite3.Row; row_to_dict maps them by position
+    conn.row_factory = None
     # Ensure text is returned as str, not bytes
     conn.text_factory = str
+
+    _tls.conn = conn
+    _tls.inode = db_inode if db_inode is not None else os.stat(DB_PATH).st_ino
+    with _open_connections_lock:
+        _open_connections.add(conn)
     return conn
 
+def close_db_connection():
+    """Close this thread's SQLite connection, if it has one."""
+    conn = getattr(_tls, 'conn', None)
+    if conn is None:
+        return
+    _tls.conn = None
+    with _open_connections_lock:
+        _open_connections.discard(conn)
+    conn.close()
+
+def close_all_db_connections():
+    """Close every thread's SQLite connection (process shutdown)."""
+    with _open_connections_lock:
+        connections = list(_open_connections)
+        _open_connections.clear()
+    for conn in connections:
+        conn.close()
+
+atexit.register(close_all_db_connections)
+
+@app.teardown_appcontext
+def release_db_connection(exc):
+    if not app.config['PERSISTENT_DB_CONNECTIONS']:
+        close_db_connection()
+
+# Indexes on the most-filtered stock_indicators columns (mirrors data/init_database.py)
+STOCK_INDICATOR_INDEXES = """
+    CREATE INDEX IF NOT EXISTS idx_rsi_14 ON stock_indicators(rsi_14);
+    CREATE INDEX IF NOT EXISTS idx_williams_r_21 ON stock_indicators(williams_r_21);
+    CREATE INDEX IF NOT EXISTS idx_adx_14 ON stock_indicators(adx_14);
+    CREATE INDEX IF NOT EXISTS idx_macd ON stock_indicators(macd);
+    CREATE INDEX IF NOT EXISTS idx_mfi_14 ON stock_indicators(mfi_14);
+    CREATE INDEX IF NOT EXISTS idx_data_age_days ON stock_indicators(data_age_days);
+    CREATE INDEX IF NOT EXISTS idx_oversold_cover ON stock_indicators(
+        williams_r_21, symbol, close, rsi_14, adx_14, price_vs_sma200_pct,
+        pct_from_52w_high, pct_from_52w_low, bb_position, relative_volume,
+        macd_hist, volume, hist_volatility_20
+    ) WHERE williams_r_21 < -80;
+"""
+
+def ensure_db_indexes():
+    """Create missing filter indexes on an existing database and refresh planner statistics."""
+    if not os.path.exists(DB_PATH):
+        return
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        conn.executescript(STOCK_INDICATOR_INDEXES)
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        conn.commit()
+        conn.close()
+        logging.info("Verified stock_indicators indexes.")
+    except Exception as e:
+        logging.error(f"Error creating stock_indicators indexes: {e}")
+
+def decode_text(value):
+    """Decode a TEXT value that SQLite returned as bytes."""
+    try:
+        return value.decode('utf-8')
+    except UnicodeDecodeError:
+        # Try Windows-1252 encoding as fallback
+        try:
+            return value.decode('cp1252')
+        except UnicodeDecodeError:
+            # Last resort: replace invalid characters
+            return value.decode('utf-8', errors='replace')
+
 def row_to_dict(row):
-    """Convert SQLite row to dictionary with proper field names and JSON-safe values."""
+    """
+    Convert a positional SQLite row (SELECT_COLUMNS order) to a dict with JSON field names.
+    NaN/Infinity are stored as NULL by process_indicators.py, and orjson writes any
+    stragglers as null, so values are passed through unchecked.
+    """
     if row is None:
         return None
 
-    result = {}
-    for key in row.keys():
-        db_field = key
-        json_field = FIELD_MAP.get(db_field, db_field)
-        value = row[db_field]
-
-        # Convert bytes to string (with error handling)
-        if isinstance(value, bytes):
-            try:
-                value = value.decode('utf-8')
-            except UnicodeDecodeError:
-                # Try Windows-1252 encoding as fallback
-                try:
-                    value = value.decode('cp1252')
-                except:
-                    # Last resort: replace invalid characters
-                    value = value.decode('utf-8', errors='replace')
+    # Convert bytes to string for text columns
+    for i in TEXT_COLUMN_INDEXES:
+        if isinstance(row[i], (bytes, memoryview)):
+            row = list(row)
+            row[i] = decode_text(bytes(row[i]))
 
-        # Convert memoryview to bytes first, then to appropriate type
-        if isinstance(value, memoryview):
-            value = bytes(value)
+    return dict(zip(JSON_KEYS, row))
 
-        # Handle NaN and Infinity for valid JSON
-        if isinstance(value, float):
-            if math.isnan(value) or math.isinf(value):
-                value = None
+def text_default(value):
+    """orjson default hook: decode TEXT values that SQLite returned as bytes."""
+    if isinstance(value, (bytes, memoryview)):
+        return decode_text(bytes(value))
+    raise TypeError
 
-        # Store value with proper type
-        result[json_field] = value
+# Flush the streamed /api/stock-screen body in chunks of roughly this many bytes
+STREAM_CHUNK_SIZE = 64 * 1024
 
-    return result
+def stream_screen_results(cursor):
+    """
+    Stream {"results": [...], "total": N} straight from a stock_indicators cursor,
+    serializing each tuple row with orjson instead of building row dicts and a
+    full result list first. "total" comes last since it is only known at the end.
+    """
+    buf = bytearray(b'{"results":[')
+    total = 0
+    for row in cursor:
+        if total:
+            buf += b','
+        buf += orjson.dumps(dict(zip(JSON_KEYS, row)), default=text_default)
+        total += 1
+        if len(buf) >= STREAM_CHUNK_SIZE:
+            yield bytes(buf)
+            buf.clear()
+    buf += b'],"total":' + str(total).encode() + b'}'
+    yield bytes(buf)
+    logging.info(f"Screened {total} stocks with POST filters.")
+
+# S&P 500 CSV columns served as numbers rather than strings
+SP500_INT_COLUMNS = ('CIK',)
+
+def parse_sp500_row(row):
+    """Convert a csv.DictReader row to JSON-ready values (empty cells become null)."""
+    for key, value in row.items():
+        if value == '':
+            row[key] = None
+        elif key in SP500_INT_COLUMNS:
+            row[key] = int(value)
+    return row
 
 def load_sp500_companies():
+    """Load S&P 500 companies from CSV (cached until the file changes)."""
     try:
-        df = pd.read_csv(SP500_CSV)
-        companies = df.to_dict(orient='records')
-        logging.info("Loaded S&P 500 companies.")
-        return companies
+        mtime = os.stat(SP500_CSV).st_mtime_ns
+        with _CACHE_LOCK:
+            if _SP500_CACHE['mtime'] != mtime:
+                with open(SP500_CSV, newline='', encoding='utf-8') as f:
+                    companies = [parse_sp500_row(row) for row in csv.DictReader(f)]
+                _SP500_CACHE['value'] = companies
+                _SP500_CACHE['json_bytes'] = orjson.dumps(companies, option=ORJSON_OPTIONS)
+                _SP500_CACHE['mtime'] = mtime
+                logging.info("Loaded S&P 500 companies.")
+            return _SP500_CACHE['value']
     except Exception as e:
         logging.error(f"Error loading S&P 500 companies: {e}")
         return []
 
+# Generated SQL per query shape (filter columns/bounds, sort, limit...), so repeat
+# requests with the same shape reuse the same SQL text
+_SQL_CACHE = {}
+_SQL_CACHE_MAX = 256
+
+# Allowlist of accepted filter/sort names: JSON field names plus the column names themselves
+ALLOWED_DB_FIELDS = frozenset(DB_COLUMNS)
+FIELD_LOOKUP = {**{col: col for col in ALLOWED_DB_FIELDS}, **JSON_TO_DB_MAP}
+
+def to_db_field(field):
+    """Map a JSON field name to its stock_indicators column, rejecting unknown columns."""
+    db_field = FIELD_LOOKUP.get(field)
+    if db_field is None and isinstance(field, str):
+        db_field = FIELD_LOOKUP.get(field.lower())
+    if db_field is None:
+        raise ValueError(f"Unknown field: {field}")
+    return db_field
+
+def build_stock_query(symbol=None, filters=None, max_age=None, sort_by=None, sort_order='asc', limit=None):
+    """Build (sql, params) for load_stock_data_from_db, reusing cached SQL for known shapes."""
+    params = []
+
+    if symbol:
+        params.append(symbol.upper())
+    if max_age is not None:
+        params.append(max_age)
+
+    # Indicator filters, ordered by column so equal shapes map to the same SQL;
+    # data_age_days goes first as it is usually the most selective
+    bounds_by_field = {}
+    for indicator, bounds in filters.items() if filters else ():
+        bounds_by_field[to_db_field(indicator)] = (bounds.get('from'), bounds.get('to'))
+
+    filter_shape = []
+    for db_field in sorted(bounds_by_field, key=lambda col: (col != 'data_age_days', col)):
+        from_val, to_val = bounds_by_field[db_field]
+        filter_shape.append((db_field, from_val is not None, to_val is not None))
+        if from_val is not None:
+            params.append(from_val)
+        if to_val is not None:
+            params.append(to_val)
+
+    db_sort_field = to_db_field(sort_by) if sort_by else 'symbol'
+    order = 'DESC' if sort_by and sort_order.lower() == 'desc' else 'ASC'
+
+    if limit:
+        params.append(int(limit))
+
+    shape = (bool(symbol), max_age is not None, tuple(filter_shape), db_sort_field, order, bool(limit))
+    query = _SQL_CACHE.get(shape)
+    if query is None:
+        query = f"SELECT {SELECT_COLUMNS} FROM stock_indicators WHERE 1=1"
+        if symbol:
+            query += " AND symbol = ?"
+        if max_age is not None:
+            query += " AND data_age_days <= ?"
+        for db_field, has_from, has_to in filter_shape:
+            if has_from and has_to:
+                query += f" AND {db_field} BETWEEN ? AND ?"
+            elif has_from:
+                query += f" AND {db_field} >= ?"
+            elif has_to:
+                query += f" AND {db_field} <= ?"
+        query += f" ORDER BY {db_sort_field} {order}"
+        if limit:
+            query += " LIMIT ?"
+        if len(_SQL_CACHE) >= _SQL_CACHE_MAX:
+            _SQL_CACHE.clear()
+        _SQL_CACHE[shape] = query
+
+    return query, params
+
 def load_stock_data_from_db(symbol=None, filters=None, max_age=None, sort_by=None, sort_order='asc', limit=None):
     """
     Load stock data from SQLite database with optional filtering.
@@ -162,97 +505,94 @@ def load_stock_data_from_db(symbol=None, filters=None, max_age=None, sort_by=Non
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        # Build query
-        query = "SELECT * FROM stock_indicators WHERE 1=1"
-        params = []
-
-        # Symbol filter
-        if symbol:
-            query += " AND symbol = ?"
-            params.append(symbol.upper())
-
-        # Data age filter
-        if max_age is not None:
-            query += " AND data_age_days <= ?"
-            params.append(max_age)
-
-        # Indicator filters
-        if filters:
-            for indicator, bounds in filters.items():
-                # Convert JSON field name to database column name
-                db_field = JSON_TO_DB_MAP.get(indicator, indicator.lower())
-
-                from_val = bounds.get('from')
-                to_val = bounds.get('to')
-
-                if from_val is not None:
-                    query += f" AND {db_field} >= ?"
-                    params.append(from_val)
-
-                if to_val is not None:
-                    query += f" AND {db_field} <= ?"
-                    params.append(to_val)
-
-        # Sorting
-        if sort_by:
-            db_sort_field = JSON_TO_DB_MAP.get(sort_by, sort_by.lower())
-            order = 'DESC' if sort_order.lower() == 'desc' else 'ASC'
-            query += f" ORDER BY {db_sort_field} {order}"
-        else:
-            query += " ORDER BY symbol ASC"
-
-        # Limit
-        if limit:
-            query += f" LIMIT {int(limit)}"
-
+        query, params = build_stock_query(symbol, filters, max_age, sort_by, sort_order, limit)
         cursor.execute(query, params)
         rows = cursor.fetchall()
 
-        # Convert to dicts
+        # Convert to dicts (the connection is released at request teardown)
         results = [row_to_dict(row) for row in rows]
 
-        conn.close()
         return results
 
     except Exception as e:
         logging.error(f"Error loading stock data from DB: {e}")
         return []
 
+def get_db_version():
+    """Return a token that changes whenever the database file (or its WAL) is written."""
+    version = []
+    for path in (DB_PATH, DB_PATH + '-wal'):
+        try:
+            st = os.stat(path)
+            version.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+def load_all_stock_data_json():
+    """
+    Return (count, json_bytes) for the unfiltered stock scan.
+    The serialized payload is rebuilt only when the database changes.
+    """
+    version = get_db_version()
+    with _ALL_CACHE_LOCK:
+        if _ALL_CACHE['version'] != version:
+            stock_data = load_stock_data_from_db()
+            if not stock_data:
+                # Don't cache empty/failed loads
+                return 0, None
+            _ALL_CACHE['json_bytes'] = orjson.dumps(stock_data, option=ORJSON_OPTIONS)
+            _ALL_CACHE['count'] = len(stock_data)
+            _ALL_CACHE['version'] = version
+            logging.info(f"Cached unfiltered stock data ({len(stock_data)} entries).")
+        return _ALL_CACHE['count'], _ALL_CACHE['json_bytes']
+
 def load_indicators_config():
-    """Load indicators configuration from JSON file"""
+    """Load indicators configuration from JSON file (cached until the file changes)"""
     try:
-        with open(INDICATORS_CONFIG, 'r') as f:
-            config = json.load(f)
-        logging.info("Loaded indicators configuration.")
-        return config
+        mtime = os.stat(INDICATORS_CONFIG).st_mtime_ns
+        with _CACHE_LOCK:
+            if _CONFIG_CACHE['mtime'] != mtime:
+                with open(INDICATORS_CONFIG, 'rb') as f:
+                    _CONFIG_CACHE['value'] = orjson.loads(f.read())
+                _CONFIG_CACHE['mtime'] = mtime
+                logging.info("Loaded indicators configuration.")
+            return _CONFIG_CACHE['value']
     except Exception as e:
         logging.error(f"Error loading indicators configuration: {e}")
         return None
 
 @app.route('/api/config/indicators', methods=['GET'])
+@etag_cached(config_version)
 def get_indicators_config():
     """Get the indicators configuration"""
     config = load_indicators_config()
     if config:
-        return jsonify(config), 200
+        return ojsonify(config, 200)
     else:
-        return jsonify({"error": "Configuration not available"}), 500
+        return ojsonify({"error": "Configuration not available"}, 500)
 
 @app.route('/api/config/presets', methods=['GET'])
+@etag_cached(config_version)
 def get_presets():
     """Get all preset strategies"""
     config = load_indicators_config()
     if config and 'preset_strategies' in config:
-        return jsonify(config['preset_strategies']), 200
+        return ojsonify(config['preset_strategies'], 200)
     else:
-        return jsonify({"error": "Presets not available"}), 500
+        return ojsonify({"error": "Presets not available"}, 500)
 
 @app.route('/api/sp500', methods=['GET'])
+@etag_cached(sp500_version)
 def get_sp500():
     companies = load_sp500_companies()
-    return jsonify(companies), 200
+    if not companies:
+        return ojsonify([], 200)
+    # Serve the pre-serialized payload instead of re-encoding the list per request
+    return app.response_class(_SP500_CACHE['json_bytes'], status=200, mimetype='application/json')
 
 @app.route('/api/stock-all-data', methods=['GET'])
+@etag_cached(stock_data_version, cache_control='no-cache')
 def get_all_stock_data():
     """
     Enhanced endpoint that supports dynamic filtering on any indicator.
@@ -273,7 +613,7 @@ def get_all_stock_data():
                     filters = preset.get('filters', {})
                     logging.info(f"Applying preset: {preset_name}")
                 else:
-                    return jsonify({"error": f"Preset '{preset_name}' not found"}), 400
+                    return ojsonify({"error": f"Preset '{preset_name}' not found"}, 400)
         else:
             # Build filters from query parameters dynamically
             for key in request.args.keys():
@@ -293,19 +633,28 @@ def get_all_stock_data():
         # Data age filter (optional)
         max_age = request.args.get('max_age', type=int)
 
+        # Unfiltered scan: serve the cached payload without touching the database
+        if not filters and max_age is None:
+            count, payload = load_all_stock_data_json()
+            if not payload:
+                logging.warning("No stock data available.")
+                return ojsonify([], 200)
+            logging.info(f"Served {count} stock data entries (cached).")
+            return app.response_class(payload, status=200, mimetype='application/json')
+
         # Load filtered stock data from database
         stock_data = load_stock_data_from_db(filters=filters, max_age=max_age)
 
         if not stock_data:
             logging.warning("No stock data available matching filters.")
-            return jsonify([]), 200  # Return empty array, not error
+            return ojsonify([], 200)  # Return empty array, not error
 
         logging.info(f"Served {len(stock_data)} filtered stock data entries.")
-        return jsonify(stock_data), 200
+        return ojsonify(stock_data, 200)
 
     except Exception as e:
         logging.error(f"Error fetching all stock data: {e}")
-        return jsonify({"error": "Internal Server Error"}), 500
+        return ojsonify({"error": "Internal Server Error"}, 500)
 
 @app.route('/api/stock-screen', methods=['POST'])
 def screen_stocks():
@@ -326,36 +675,35 @@ def screen_stocks():
         limit = request_data.get('limit', None)
         max_age = request_data.get('max_age', None)
 
-        # Load filtered and sorted stock data from database
-        stock_data = load_stock_data_from_db(
-            filters=filters,
-            max_age=max_age,
-            sort_by=sort_by,
-            sort_order=sort_order,
-            limit=limit
-        )
-
-        logging.info(f"Screened {len(stock_data)} stocks with POST filters.")
-        return jsonify({
-            "total": len(stock_data),
-            "results": stock_data
-        }), 200
+        try:
+            query, params = build_stock_query(None, filters, max_age, sort_by, sort_order, limit)
+        except ValueError as e:
+            return ojsonify({"error": str(e)}, 400)
+
+        try:
+            cursor = get_db_connection().execute(query, params)
+        except Exception as e:
+            logging.error(f"Error loading stock data from DB: {e}")
+            return ojsonify({"total": 0, "results": []}, 200)
+
+        # Rows are serialized as they are read from SQLite
+        return app.response_class(stream_screen_results(cursor), status=200, mimetype='application/json')
 
     except Exception as e:
         logging.error(f"Error in stock screening: {e}")
-        return jsonify({"error": "Internal Server Error"}), 500
+        return ojsonify({"error": "Internal Server Error"}, 500)
 
 @app.route('/api/stock-data/<string:symbol>', methods=['GET'])
 def get_stock_data(symbol):
     try:
         data = load_stock_data_from_db(symbol=symbol.upper())
         if data and len(data) > 0:
-            return jsonify(data[0]), 200
+            return ojsonify(data[0], 200)
         else:
-            return jsonify({"error": "Symbol not found"}), 404
+            return ojsonify({"error": "Symbol not found"}, 404)
     except Exception as e:
         logging.error(f"Error fetching data for {symbol}: {e}")
-        return jsonify({"error": "Internal Server Error"}), 500
+        return ojsonify({"error": "Internal Server Error"}, 500)
 
 # ==================== DATA REFRESH ENDPOINTS ====================
 
@@ -368,13 +716,13 @@ def trigger_data_refresh():
     try:
         result = job_manager.start_refresh()
         status_code = 200 if result['success'] else 409  # 409 Conflict if already running
-        return jsonify(result), status_code
+        return ojsonify(result, status_code)
     except Exception as e:
         logging.error(f"Error triggering data refresh: {e}")
-        return jsonify({
+        return ojsonify({
             'success': False,
             'message': f'Error: {str(e)}'
-        }), 500
+        }, 500)
 
 @app.route('/api/refresh-status', methods=['GET'])
 def get_refresh_status():
@@ -384,13 +732,13 @@ def get_refresh_status():
     """
     try:
         status = job_manager.get_status()
-        return jsonify(status), 200
+        return ojsonify(status, 200)
     except Exception as e:
         logging.error(f"Error getting refresh status: {e}")
-        return jsonify({
+        return ojsonify({
             'status': 'error',
             'error': str(e)
-        }), 500
+        }, 500)
 
 @app.route('/api/refresh-reset', methods=['POST'])
 def reset_refresh_status():
@@ -401,13 +749,16 @@ def reset_refresh_status():
     try:
         result = job_manager.reset_to_idle()
         status_code = 200 if result['success'] else 409
-        return jsonify(result), status_code
+        return ojsonify(result, status_code)
     except Exception as e:
         logging.error(f"Error resetting refresh status: {e}")
-        return jsonify({
+        return ojsonify({
             'success': False,
             'message': f'Error: {str(e)}'
-        }), 500
+        }, 500)
+
+ensure_db_indexes()
+load_sp500_companies()  # warm the cache so the first /api/sp500 request skips parsing
 
 if __name__ == '__main__':
     # Enable threading to allow background jobs while serving requests
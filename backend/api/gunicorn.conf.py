@@ -0,0 +1,41 @@
+# backend/api/gunicorn.conf.py
+"""
+Gunicorn settings for the stock screener API.
+Run from backend/api (paths in app.py are relative): gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5001')
+
+# Threaded workers: sqlite3 releases the GIL while executing queries, and the
+# pool threads live as long as the worker, so post_fork lets app.py keep one
+# SQLite connection per thread. (gevent would make threading.local
+# greenlet-local and open a connection per request.)
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# One worker by default. The response caches in app.py (the pre-serialized
+# /api/stock-all-data payload, config and S&P 500 files) are per process, so
+# every extra worker holds its own copy and rebuilds it after each database
+# write. ETags are derived from file/database mtimes, so all workers issue the
+# same tags, and refresh job state is kept in SQLite. Raise GUNICORN_WORKERS
+# only when one worker's threads are not enough.
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+
+# Import the app once in the master so startup work (index checks) runs once
+preload_app = True
+
+timeout = 120
+keepalive = 5
+
+def post_fork(server, worker):
+    # Threads don't survive fork, so each worker needs its own log writer thread
+    import app
+    app.start_log_listener()
+    # gthread's pool threads outlive requests, so their connections are reused
+    app.app.config['PERSISTENT_DB_CONNECTIONS'] = True
+
+def worker_exit(server, worker):
+    import app
+    app.close_all_db_connections()
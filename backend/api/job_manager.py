@@ -5,10 +5,15 @@ Handles execution of fetch and process scripts as background jobs.
 """
 
 import threading
+import asyncio
 import subprocess
 import json
 import os
+import sqlite3
 import logging
+import re
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 
@@ -18,56 +23,125 @@ logging.basicConfig(
     format='%(asctime)s %(levelname)s:%(message)s'
 )
 
+# "Progress: 50/503 symbols processed..." lines printed by the fetch/process scripts
+PROGRESS_RE = re.compile(r'Progress: (\d+)/(\d+)')
+
+# Lines of child stderr kept for the failure message
+STDERR_TAIL_LINES = 50
+
+# Job state lives in a single-row table of its own database file, so progress
+# writes don't touch stocks.db (whose mtime keys the API's caches and ETags)
+JOB_STATE_DB = '../data/job_state.db'
+
+JOB_STATE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS job_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        status TEXT,
+        phase TEXT,
+        started_at TEXT,
+        completed_at TEXT,
+        last_successful_refresh TEXT,
+        error TEXT,
+        progress_json TEXT
+    )
+"""
+
+IDLE_STATE = {
+    'status': 'idle',
+    'phase': None,
+    'started_at': None,
+    'completed_at': None,
+    'last_successful_refresh': None,
+    'error': None,
+    'progress': {
+        'current_phase': None,
+        'message': 'No refresh in progress'
+    }
+}
+
 class DataRefreshJobManager:
     """
     Manages background data refresh jobs.
-    Uses file-based state persistence for job status tracking.
+    Job status is persisted in the job_state table of JOB_STATE_DB; SQLite's
+    write lock (BEGIN IMMEDIATE) serializes read-modify-write updates.
     """
 
-    def __init__(self, state_file='../logs/refresh_job_state.json'):
-        self.state_file = state_file
-        self.lock = threading.Lock()
+    def __init__(self, db_path=JOB_STATE_DB):
+        self.db_path = db_path
         self.current_thread = None
-        self._ensure_state_file()
 
-    def _ensure_state_file(self):
-        """Ensure state file and directory exist."""
-        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
-        if not os.path.exists(self.state_file):
-            self._save_state({
-                'status': 'idle',
-                'phase': None,
-                'started_at': None,
-                'completed_at': None,
-                'last_successful_refresh': None,
-                'error': None,
-                'progress': {
-                    'current_phase': None,
-                    'message': 'No refresh in progress'
-                }
-            })
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
 
-    def _load_state(self):
-        """Load current job state from file."""
+    @contextmanager
+    def _transaction(self):
+        """Yield a connection holding the database write lock until commit."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(JOB_STATE_SCHEMA)  # created on first write; no-op afterwards
+            yield conn
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _load_state(self, conn):
+        """Load current job state from the database."""
         try:
-            with open(self.state_file, 'r') as f:
-                return json.load(f)
+            row = conn.execute(
+                'SELECT status, phase, started_at, completed_at, last_successful_refresh, error, progress_json '
+                'FROM job_state WHERE id = 1'
+            ).fetchone()
         except Exception as e:
             logging.error(f"Error loading job state: {e}")
             return {'status': 'idle', 'error': str(e)}
 
-    def _save_state(self, state):
-        """Save job state to file."""
-        try:
-            with open(self.state_file, 'w') as f:
-                json.dump(state, f, indent=2)
-        except Exception as e:
-            logging.error(f"Error saving job state: {e}")
+        if row is None:
+            return dict(IDLE_STATE)
+        status, phase, started_at, completed_at, last_refresh, error, progress_json = row
+        return {
+            'status': status,
+            'phase': phase,
+            'started_at': started_at,
+            'completed_at': completed_at,
+            'last_successful_refresh': last_refresh,
+            'error': error,
+            'progress': json.loads(progress_json) if progress_json else None
+        }
+
+    def _save_state(self, state, conn):
+        """Save job state to the database."""
+        conn.execute(
+            'INSERT OR REPLACE INTO job_state '
+            '(id, status, phase, started_at, completed_at, last_successful_refresh, error, progress_json) '
+            'VALUES (1, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                state.get('status'),
+                state.get('phase'),
+                state.get('started_at'),
+                state.get('completed_at'),
+                state.get('last_successful_refresh'),
+                state.get('error'),
+                json.dumps(state.get('progress'))
+            )
+        )
 
     def get_status(self):
         """Get current job status."""
-        with self.lock:
-            return self._load_state()
+        if not os.path.exists(self.db_path):
+            # No job has been started yet (the file is created on the first write)
+            return dict(IDLE_STATE)
+        conn = self._connect()
+        try:
+            return self._load_state(conn)
+        finally:
+            conn.close()
 
     def is_running(self):
         """Check if a job is currently running."""
@@ -79,9 +153,8 @@ class DataRefreshJobManager:
         Start a new data refresh job in the background.
         Returns: dict with success status and message.
         """
-        with self.lock:
-            # Check if job is running (without calling is_running to avoid nested lock)
-            current_state = self._load_state()
+        with self._transaction() as conn:
+            current_state = self._load_state(conn)
             if current_state.get('status') in ['fetching', 'processing']:
                 return {
                     'success': False,
@@ -102,23 +175,76 @@ class DataRefreshJobManager:
                     'message': 'Incrementally updating data for S&P 500 stocks...'
                 }
             }
-            self._save_state(state)
+            self._save_state(state, conn)
 
-            # Start background thread
-            self.current_thread = threading.Thread(target=self._run_refresh_job, daemon=True)
-            self.current_thread.start()
+        # Start background thread
+        self.current_thread = threading.Thread(target=self._run_refresh_job, daemon=True)
+        self.current_thread.start()
 
-            return {
-                'success': True,
-                'message': 'Data refresh job started',
-                'status': state
-            }
+        return {
+            'success': True,
+            'message': 'Data refresh job started',
+            'status': state
+        }
 
     def _run_refresh_job(self):
         """
         Execute the data refresh job (fetch + process).
-        Runs in a background thread.
+        Runs in a background thread, on its own event loop.
+        """
+        asyncio.run(self._run_refresh_job_async())
+
+    async def _run_script(self, script, cwd, timeout, status=None):
         """
+        Run a Python script as a child process, streaming its output line by line.
+        stdout lines are logged, and the scripts' "Progress: i/N" lines update the
+        job progress for `status`. Returns (returncode, stderr tail); raises
+        subprocess.TimeoutExpired if it runs longer than timeout seconds. The
+        child is killed whenever this raises.
+        """
+        proc = await asyncio.create_subprocess_exec(
+            'python', script,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env={**os.environ, 'PYTHONUNBUFFERED': '1'}  # flush prints as they happen
+        )
+        stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+
+        async def read_stdout():
+            async for raw in proc.stdout:
+                line = raw.decode(errors='replace').rstrip()
+                logging.info(f"[{script}] {line}")
+                match = PROGRESS_RE.match(line)
+                if match and status:
+                    done, total = match.groups()
+                    # Off the event loop (it may wait on the database lock the child
+                    # holds); a failed progress write must not stop us reading the pipes
+                    try:
+                        await asyncio.to_thread(self._update_progress, status, f"{done}/{total} symbols processed...")
+                    except Exception as e:
+                        logging.error(f"Error updating progress for {script}: {e}")
+
+        async def read_stderr():
+            async for raw in proc.stderr:
+                line = raw.decode(errors='replace').rstrip()
+                logging.debug(f"[{script}] {line}")
+                stderr_tail.append(line)
+
+        try:
+            await asyncio.wait_for(asyncio.gather(read_stdout(), read_stderr(), proc.wait()), timeout)
+        except asyncio.TimeoutError:
+            raise subprocess.TimeoutExpired(script, timeout)
+        finally:
+            # On any error (timeout included) don't leave the child running unread
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+
+        return proc.returncode, '\n'.join(stderr_tail)
+
+    async def _run_refresh_job_async(self):
+        """Fetch + process phases of the refresh job."""
         scripts_dir = os.path.join(os.path.dirname(__file__), '../scripts')
 
         try:
@@ -126,16 +252,15 @@ class DataRefreshJobManager:
             logging.info("Starting fetch phase...")
             self._update_progress('fetching', 'Fetching new stock data from NASDAQ API (incremental)...')
 
-            fetch_result = subprocess.run(
-                ['python', 'incremental_fetch.py'],
-                cwd=scripts_dir,
-                capture_output=True,
-                text=True,
-                timeout=900  # 15 minute timeout (increased for NASDAQ API)
+            returncode, stderr = await self._run_script(
+                'incremental_fetch.py',
+                scripts_dir,
+                timeout=900,  # 15 minute timeout (increased for NASDAQ API)
+                status='fetching'
             )
 
-            if fetch_result.returncode != 0:
-                raise Exception(f"Fetch failed: {fetch_result.stderr}")
+            if returncode != 0:
+                raise Exception(f"Fetch failed: {stderr}")
 
             logging.info("Fetch phase completed successfully")
 
@@ -143,38 +268,38 @@ class DataRefreshJobManager:
             logging.info("Starting process phase...")
             self._update_progress('processing', 'Processing data and calculating technical indicators...')
 
-            process_result = subprocess.run(
-                ['python', 'process_indicators.py'],
-                cwd=scripts_dir,
-                capture_output=True,
-                text=True,
-                timeout=900  # 15 minute timeout
+            returncode, stderr = await self._run_script(
+                'process_indicators.py',
+                scripts_dir,
+                timeout=900,  # 15 minute timeout
+                status='processing'
             )
 
-            if process_result.returncode != 0:
-                raise Exception(f"Processing failed: {process_result.stderr}")
+            if returncode != 0:
+                raise Exception(f"Processing failed: {stderr}")
 
             logging.info("Process phase completed successfully")
 
             # Job completed successfully
             completed_time = datetime.now().isoformat()
-            state = {
-                'status': 'completed',
-                'phase': 'completed',
-                'started_at': self._load_state().get('started_at'),
-                'completed_at': completed_time,
-                'last_successful_refresh': completed_time,
-                'error': None,
-                'progress': {
-                    'current_phase': 'Completed',
-                    'message': 'Data refresh completed successfully'
+            with self._transaction() as conn:
+                state = {
+                    'status': 'completed',
+                    'phase': 'completed',
+                    'started_at': self._load_state(conn).get('started_at'),
+                    'completed_at': completed_time,
+                    'last_successful_refresh': completed_time,
+                    'error': None,
+                    'progress': {
+                        'current_phase': 'Completed',
+                        'message': 'Data refresh completed successfully'
+                    }
                 }
-            }
-            self._save_state(state)
+                self._save_state(state, conn)
             logging.info("Data refresh job completed successfully")
 
         except subprocess.TimeoutExpired as e:
-            error_msg = f"Job timed out during {self._load_state().get('phase')} phase"
+            error_msg = f"Job timed out during {self.get_status().get('phase')} phase"
             logging.error(error_msg)
             self._mark_failed(error_msg)
 
@@ -185,20 +310,20 @@ class DataRefreshJobManager:
 
     def _update_progress(self, status, message):
         """Update job progress."""
-        with self.lock:
-            state = self._load_state()
+        with self._transaction() as conn:
+            state = self._load_state(conn)
             state['status'] = status
             state['phase'] = status
             state['progress'] = {
                 'current_phase': status.capitalize(),
                 'message': message
             }
-            self._save_state(state)
+            self._save_state(state, conn)
 
     def _mark_failed(self, error_message):
         """Mark job as failed with error message."""
-        with self.lock:
-            state = self._load_state()
+        with self._transaction() as conn:
+            state = self._load_state(conn)
             state['status'] = 'failed'
             state['phase'] = 'failed'
             state['completed_at'] = datetime.now().isoformat()
@@ -207,18 +332,18 @@ class DataRefreshJobManager:
                 'current_phase': 'Failed',
                 'message': error_message
             }
-            self._save_state(state)
+            self._save_state(state, conn)
 
     def reset_to_idle(self):
         """Reset job status to idle (for clearing completed/failed states)."""
-        with self.lock:
-            if self.is_running():
+        with self._transaction() as conn:
+            state = self._load_state(conn)
+            if state.get('status') in ['fetching', 'processing']:
                 return {
                     'success': False,
                     'message': 'Cannot reset while job is running'
                 }
 
-            state = self._load_state()
             # Preserve last successful refresh time
             last_refresh = state.get('last_successful_refresh')
 
@@ -234,7 +359,7 @@ class DataRefreshJobManager:
                     'message': 'No refresh in progress'
                 }
             }
-            self._save_state(new_state)
+            self._save_state(new_state, conn)
 
             return {
                 'success': True,
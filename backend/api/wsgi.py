@@ -0,0 +1,9 @@
+# backend/api/wsgi.py
+"""
+WSGI entrypoint for running the API under a production server:
+
+    cd backend/api
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from app import app
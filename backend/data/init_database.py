@@ -21,6 +21,17 @@ def create_database():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
+    # WAL is stored in the database file, so every later connection gets it:
+    # readers (API, analysis scripts) no longer block on the indicator writer.
+    # The rest only apply to this connection (index builds below).
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA cache_size=-65536')
+
+    # Create the whole schema in one transaction (one commit instead of one per statement)
+    cursor.execute('BEGIN')
+
     # Table 1: Stock metadata
     cursor.execute('''
         CREATE TABLE stocks (
@@ -138,6 +149,20 @@ def create_database():
     cursor.execute('CREATE INDEX idx_rsi_14 ON stock_indicators(rsi_14)')
     cursor.execute('CREATE INDEX idx_williams_r_21 ON stock_indicators(williams_r_21)')
     cursor.execute('CREATE INDEX idx_adx_14 ON stock_indicators(adx_14)')
+    cursor.execute('CREATE INDEX idx_macd ON stock_indicators(macd)')
+    cursor.execute('CREATE INDEX idx_mfi_14 ON stock_indicators(mfi_14)')
+    cursor.execute('CREATE INDEX idx_data_age_days ON stock_indicators(data_age_days)')
+
+    # Covering index for the oversold screener (analyze_oversold.py): every column
+    # it reads is in the index, so SQLite never has to visit the table rows.
+    # Partial: only oversold rows are indexed (the WHERE must match the query's).
+    cursor.execute('''
+        CREATE INDEX idx_oversold_cover ON stock_indicators(
+            williams_r_21, symbol, close, rsi_14, adx_14, price_vs_sma200_pct,
+            pct_from_52w_high, pct_from_52w_low, bb_position, relative_volume,
+            macd_hist, volume, hist_volatility_20
+        ) WHERE williams_r_21 < -80
+    ''')
 
     conn.commit()
     conn.close()
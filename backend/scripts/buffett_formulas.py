@@ -5,31 +5,100 @@ Based on Berkshire Hathaway's investment criteria and Buffett's letters to share
 """
 
 import logging
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Any
+import numpy as np
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Any
 from enum import Enum
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s %(levelname)s:%(message)s'
-)
+# Numba is optional: with it the batch engine runs a compiled, fused kernel,
+# without it the same formulas run as NumPy whole-array expressions
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    prange = range
+    NUMBA_AVAILABLE = False
 
 class FormulaStatus(Enum):
     PASS = "PASS"
     FAIL = "FAIL"
     INSUFFICIENT_DATA = "INSUFFICIENT_DATA"
 
-@dataclass
-class FormulaResult:
-    """Result of a single Buffett formula evaluation."""
+class FormulaMeta(NamedTuple):
+    """Constant name, description, target and details template of one formula."""
     name: str
     description: str
+    target: float
+    details_format: str  # str.format template, filled from FormulaResult.raw
+
+# One entry per formula, in evaluation order; FormulaResult.formula_id indexes it
+FORMULA_META = (
+    # Cash should cover 100% of debt
+    FormulaMeta("Cash Test", "Cash + Short-Term Investments > Total Debt", 1.0,
+                "Cash/Investments: ${0:,.0f}, Debt: ${1:,.0f}, Ratio: {2:.2f}x"),
+    # Maximum 0.5x debt-to-equity
+    FormulaMeta("Debt-to-Equity", "Total Liabilities / Equity < 0.5", 0.5,
+                "Liabilities: ${0:,.0f}, Equity: ${1:,.0f}, Ratio: {2:.2f}"),
+    # FCF should cover 25% of debt annually
+    FormulaMeta("Free Cash Flow to Debt", "Free Cash Flow / Total Debt > 0.25", 0.25,
+                "FCF: ${0:,.0f}, Debt: ${1:,.0f}, Ratio: {2:.2f}"),
+    # Minimum 15% ROE
+    FormulaMeta("Return on Equity", "Net Income / Equity > 15%", 15.0,
+                "Net Income: ${0:,.0f}, Equity: ${1:,.0f}, ROE: {2:.1f}%"),
+    # Minimum 1.5x current ratio
+    FormulaMeta("Current Ratio", "Current Assets / Current Liabilities > 1.5", 1.5,
+                "Current Assets: ${0:,.0f}, Current Liabilities: ${1:,.0f}, Ratio: {2:.2f}x"),
+    # Minimum 12% operating margin
+    FormulaMeta("Operating Margin", "Operating Profit / Revenue > 12%", 12.0,
+                "Operating Income: ${0:,.0f}, Revenue: ${1:,.0f}, Margin: {2:.1f}%"),
+    # Minimum 0.5x asset turnover
+    FormulaMeta("Asset Turnover", "Revenue / Total Assets > 0.5", 0.5,
+                "Revenue: ${0:,.0f}, Assets: ${1:,.0f}, Turnover: {2:.2f}x"),
+    # Minimum 3x interest coverage
+    FormulaMeta("Interest Coverage", "Operating Profit / Interest Expense > 3×", 3.0,
+                "Operating Income: ${0:,.0f}, Interest Expense: ${1:,.0f}, Coverage: {2:.1f}x"),
+    # Current earnings must be positive
+    FormulaMeta("Earnings Stability", "Positive earnings (current year)", 1.0,
+                "Current Net Income: ${0:,.0f} ({1})"),
+    # Same as ROE target
+    FormulaMeta("Capital Allocation", "ROE > 15% (value creation)", 15.0,
+                "ROE: {0:.1f}% - Management {1} value"),
+)
+
+class FormulaResult(NamedTuple):
+    """
+    Result of a single Buffett formula evaluation.
+    A NamedTuple rather than a dataclass: no per-instance __dict__, and results
+    are immutable (10 of them per screened company). The constant name,
+    description and target are looked up in FORMULA_META by formula_id.
+    details is only formatted when read; most screening looks at status alone.
+    """
+    formula_id: int
     status: FormulaStatus
     value: Optional[float] = None
-    target: Optional[float] = None
-    details: Optional[str] = None
-    
+    raw: Optional[tuple] = None   # Inputs of the details template
+    error: Optional[str] = None   # Set when the formula raised
+
+    @property
+    def name(self) -> str:
+        return FORMULA_META[self.formula_id].name
+
+    @property
+    def description(self) -> str:
+        return FORMULA_META[self.formula_id].description
+
+    @property
+    def target(self) -> float:
+        return FORMULA_META[self.formula_id].target
+
+    @property
+    def details(self) -> Optional[str]:
+        if self.error is not None:
+            return f"Error evaluating formula: {self.error}"
+        if self.raw is None:
+            return None
+        return FORMULA_META[self.formula_id].details_format.format(*self.raw)
+
     def to_dict(self):
         return {
             'name': self.name,
@@ -40,6 +109,94 @@ class FormulaResult:
             'details': self.details
         }
 
+# Pass thresholds: the FORMULA_META targets, shared by the formula kernels
+# below and BatchBuffettEngine's NumPy path
+CASH_RATIO_MIN = FORMULA_META[0].target
+DEBT_TO_EQUITY_MAX = FORMULA_META[1].target
+FCF_TO_DEBT_MIN = FORMULA_META[2].target
+ROE_MIN = FORMULA_META[3].target
+CURRENT_RATIO_MIN = FORMULA_META[4].target
+OPERATING_MARGIN_MIN = FORMULA_META[5].target
+ASSET_TURNOVER_MIN = FORMULA_META[6].target
+INTEREST_COVERAGE_MIN = FORMULA_META[7].target
+CAPITAL_ALLOCATION_ROE_MIN = FORMULA_META[9].target
+
+# Pure formula kernels: plain scalars in, (passed, value) out. No dicts or
+# engine attributes, so PyPy's JIT can specialize them and numba.njit can
+# compile them unchanged (_eval_batch runs them for every company).
+
+def calc_cash_test(cash, short_term_inv, total_debt):
+    # No debt is excellent
+    ratio = float('inf') if total_debt == 0 else (cash + short_term_inv) / total_debt
+    return ratio > CASH_RATIO_MIN, ratio
+
+def calc_debt_to_equity(liabilities, equity):
+    ratio = float('inf') if equity <= 0 else liabilities / equity
+    return ratio < DEBT_TO_EQUITY_MAX, ratio
+
+def calc_free_cash_flow_to_debt(free_cash_flow, total_debt):
+    ratio = float('inf') if total_debt == 0 else free_cash_flow / total_debt
+    return ratio > FCF_TO_DEBT_MIN, ratio
+
+def calc_return_on_equity(net_income, equity):
+    roe = 0 if equity <= 0 else (net_income / equity) * 100  # Convert to percentage
+    return roe > ROE_MIN, roe
+
+def calc_current_ratio(current_assets, current_liabilities):
+    ratio = float('inf') if current_liabilities == 0 else current_assets / current_liabilities
+    return ratio > CURRENT_RATIO_MIN, ratio
+
+def calc_operating_margin(operating_income, revenue):
+    margin = 0 if revenue == 0 else (operating_income / revenue) * 100  # Convert to percentage
+    return margin > OPERATING_MARGIN_MIN, margin
+
+def calc_asset_turnover(revenue, assets):
+    turnover = 0 if assets == 0 else revenue / assets
+    return turnover > ASSET_TURNOVER_MIN, turnover
+
+def calc_interest_coverage(operating_income, interest_expense):
+    coverage = float('inf') if interest_expense == 0 else operating_income / interest_expense
+    return coverage > INTEREST_COVERAGE_MIN, coverage
+
+def calc_earnings_stability(net_income):
+    is_positive = net_income > 0
+    return is_positive, 1.0 if is_positive else 0.0
+
+def calc_capital_allocation(roe):
+    return roe > CAPITAL_ALLOCATION_ROE_MIN, roe
+
+# Facts used by the formulas, in run_all() / BatchBuffettEngine argument order
+FORMULA_FACTS = (
+    'Assets', 'CurrentAssets', 'Liabilities', 'CurrentLiabilities', 'TotalDebt',
+    'Equity', 'CashAndEquivalents', 'ShortTermInvestments', 'Revenue',
+    'OperatingIncome', 'NetIncome', 'InterestExpense', 'FreeCashFlow'
+)
+
+def run_all(facts):
+    """
+    Evaluate all 10 formulas for one company given as a tuple in FORMULA_FACTS
+    order. Returns ten (passed, value) pairs in FORMULA_META order.
+    """
+    (assets, current_assets, liabilities, current_liabilities, total_debt, equity,
+     cash, short_term_inv, revenue, operating_income, net_income, interest_expense,
+     free_cash_flow) = facts
+    roe_result = calc_return_on_equity(net_income, equity)
+    return (
+        calc_cash_test(cash, short_term_inv, total_debt),
+        calc_debt_to_equity(liabilities, equity),
+        calc_free_cash_flow_to_debt(free_cash_flow, total_debt),
+        roe_result,
+        calc_current_ratio(current_assets, current_liabilities),
+        calc_operating_margin(operating_income, revenue),
+        calc_asset_turnover(revenue, assets),
+        calc_interest_coverage(operating_income, interest_expense),
+        calc_earnings_stability(net_income),
+        calc_capital_allocation(roe_result[1])
+    )
+
+def _status(passed):
+    return FormulaStatus.PASS if passed else FormulaStatus.FAIL
+
 class BuffettFormulaEngine:
     """
     Evaluates stocks using Warren Buffett's 10 investment formulas.
@@ -72,34 +229,21 @@ class BuffettFormulaEngine:
         }
         """
         self.facts = financial_facts
+        self._roe = None  # set by return_on_equity, reused by capital_allocation
         
     def evaluate_all(self) -> List[FormulaResult]:
         """Evaluate all 10 Buffett formulas."""
-        formulas = [
-            self.cash_test,
-            self.debt_to_equity,
-            self.free_cash_flow_to_debt,
-            self.return_on_equity,
-            self.current_ratio,
-            self.operating_margin,
-            self.asset_turnover,
-            self.interest_coverage,
-            self.earnings_stability,
-            self.capital_allocation
-        ]
-        
         results = []
-        for formula in formulas:
+        for formula_id, formula in enumerate(self._FORMULAS):
             try:
-                result = formula()
+                result = formula(self)
                 results.append(result)
             except Exception as e:
                 logging.error(f"Error evaluating formula {formula.__name__}: {e}")
                 results.append(FormulaResult(
-                    name=formula.__name__,
-                    description="Error evaluating formula",
+                    formula_id=formula_id,
                     status=FormulaStatus.INSUFFICIENT_DATA,
-                    details=str(e)
+                    error=str(e)
                 ))
         
         return results
@@ -113,23 +257,13 @@ class BuffettFormulaEngine:
         cash = self.facts.get('CashAndEquivalents', 0)
         short_term_inv = self.facts.get('ShortTermInvestments', 0)
         total_debt = self.facts.get('TotalDebt', 0)
-        
-        if total_debt == 0:
-            # No debt is excellent
-            ratio = float('inf')
-        else:
-            ratio = (cash + short_term_inv) / total_debt
-        
-        target = 1.0  # Cash should cover 100% of debt
-        status = FormulaStatus.PASS if ratio > target else FormulaStatus.FAIL
+        passed, ratio = calc_cash_test(cash, short_term_inv, total_debt)
         
         return FormulaResult(
-            name="Cash Test",
-            description="Cash + Short-Term Investments > Total Debt",
-            status=status,
+            formula_id=0,
+            status=_status(passed),
             value=ratio,
-            target=target,
-            details=f"Cash/Investments: ${cash + short_term_inv:,.0f}, Debt: ${total_debt:,.0f}, Ratio: {ratio:.2f}x"
+            raw=(cash + short_term_inv, total_debt, ratio)
         )
     
     def debt_to_equity(self) -> FormulaResult:
@@ -140,22 +274,13 @@ class BuffettFormulaEngine:
         """
         liabilities = self.facts.get('Liabilities', 0)
         equity = self.facts.get('Equity', 0)
-        
-        if equity <= 0:
-            ratio = float('inf')
-        else:
-            ratio = liabilities / equity
-        
-        target = 0.5  # Maximum 0.5x debt-to-equity
-        status = FormulaStatus.PASS if ratio < target else FormulaStatus.FAIL
+        passed, ratio = calc_debt_to_equity(liabilities, equity)
         
         return FormulaResult(
-            name="Debt-to-Equity",
-            description="Total Liabilities / Equity < 0.5",
-            status=status,
+            formula_id=1,
+            status=_status(passed),
             value=ratio,
-            target=target,
-            details=f"Liabilities: ${liabilities:,.0f}, Equity: ${equity:,.0f}, Ratio: {ratio:.2f}"
+            raw=(liabilities, equity, ratio)
         )
     
     def free_cash_flow_to_debt(self) -> FormulaResult:
@@ -166,22 +291,13 @@ class BuffettFormulaEngine:
         """
         free_cash_flow = self.facts.get('FreeCashFlow', 0)
         total_debt = self.facts.get('TotalDebt', 0)
-        
-        if total_debt == 0:
-            ratio = float('inf')
-        else:
-            ratio = free_cash_flow / total_debt
-        
-        target = 0.25  # FCF should cover 25% of debt annually
-        status = FormulaStatus.PASS if ratio > target else FormulaStatus.FAIL
+        passed, ratio = calc_free_cash_flow_to_debt(free_cash_flow, total_debt)
         
         return FormulaResult(
-            name="Free Cash Flow to Debt",
-            description="Free Cash Flow / Total Debt > 0.25",
-            status=status,
+            formula_id=2,
+            status=_status(passed),
             value=ratio,
-            target=target,
-            details=f"FCF: ${free_cash_flow:,.0f}, Debt: ${total_debt:,.0f}, Ratio: {ratio:.2f}"
+            raw=(free_cash_flow, total_debt, ratio)
         )
     
     def return_on_equity(self) -> FormulaResult:
@@ -192,22 +308,14 @@ class BuffettFormulaEngine:
         """
         net_income = self.facts.get('NetIncome', 0)
         equity = self.facts.get('Equity', 0)
-        
-        if equity <= 0:
-            roe = 0
-        else:
-            roe = (net_income / equity) * 100  # Convert to percentage
-        
-        target = 15.0  # Minimum 15% ROE
-        status = FormulaStatus.PASS if roe > target else FormulaStatus.FAIL
+        passed, roe = calc_return_on_equity(net_income, equity)
+        self._roe = roe
         
         return FormulaResult(
-            name="Return on Equity",
-            description="Net Income / Equity > 15%",
-            status=status,
+            formula_id=3,
+            status=_status(passed),
             value=roe,
-            target=target,
-            details=f"Net Income: ${net_income:,.0f}, Equity: ${equity:,.0f}, ROE: {roe:.1f}%"
+            raw=(net_income, equity, roe)
         )
     
     def current_ratio(self) -> FormulaResult:
@@ -218,22 +326,13 @@ class BuffettFormulaEngine:
         """
         current_assets = self.facts.get('CurrentAssets', 0)
         current_liabilities = self.facts.get('CurrentLiabilities', 0)
-        
-        if current_liabilities == 0:
-            ratio = float('inf')
-        else:
-            ratio = current_assets / current_liabilities
-        
-        target = 1.5  # Minimum 1.5x current ratio
-        status = FormulaStatus.PASS if ratio > target else FormulaStatus.FAIL
+        passed, ratio = calc_current_ratio(current_assets, current_liabilities)
         
         return FormulaResult(
-            name="Current Ratio",
-            description="Current Assets / Current Liabilities > 1.5",
-            status=status,
+            formula_id=4,
+            status=_status(passed),
             value=ratio,
-            target=target,
-            details=f"Current Assets: ${current_assets:,.0f}, Current Liabilities: ${current_liabilities:,.0f}, Ratio: {ratio:.2f}x"
+            raw=(current_assets, current_liabilities, ratio)
         )
     
     def operating_margin(self) -> FormulaResult:
@@ -244,22 +343,13 @@ class BuffettFormulaEngine:
         """
         operating_income = self.facts.get('OperatingIncome', 0)
         revenue = self.facts.get('Revenue', 0)
-        
-        if revenue == 0:
-            margin = 0
-        else:
-            margin = (operating_income / revenue) * 100  # Convert to percentage
-        
-        target = 12.0  # Minimum 12% operating margin
-        status = FormulaStatus.PASS if margin > target else FormulaStatus.FAIL
+        passed, margin = calc_operating_margin(operating_income, revenue)
         
         return FormulaResult(
-            name="Operating Margin",
-            description="Operating Profit / Revenue > 12%",
-            status=status,
+            formula_id=5,
+            status=_status(passed),
             value=margin,
-            target=target,
-            details=f"Operating Income: ${operating_income:,.0f}, Revenue: ${revenue:,.0f}, Margin: {margin:.1f}%"
+            raw=(operating_income, revenue, margin)
         )
     
     def asset_turnover(self) -> FormulaResult:
@@ -270,22 +360,13 @@ class BuffettFormulaEngine:
         """
         revenue = self.facts.get('Revenue', 0)
         assets = self.facts.get('Assets', 0)
-        
-        if assets == 0:
-            turnover = 0
-        else:
-            turnover = revenue / assets
-        
-        target = 0.5  # Minimum 0.5x asset turnover
-        status = FormulaStatus.PASS if turnover > target else FormulaStatus.FAIL
+        passed, turnover = calc_asset_turnover(revenue, assets)
         
         return FormulaResult(
-            name="Asset Turnover",
-            description="Revenue / Total Assets > 0.5",
-            status=status,
+            formula_id=6,
+            status=_status(passed),
             value=turnover,
-            target=target,
-            details=f"Revenue: ${revenue:,.0f}, Assets: ${assets:,.0f}, Turnover: {turnover:.2f}x"
+            raw=(revenue, assets, turnover)
         )
     
     def interest_coverage(self) -> FormulaResult:
@@ -296,22 +377,13 @@ class BuffettFormulaEngine:
         """
         operating_income = self.facts.get('OperatingIncome', 0)
         interest_expense = self.facts.get('InterestExpense', 0)
-        
-        if interest_expense == 0:
-            coverage = float('inf')
-        else:
-            coverage = operating_income / interest_expense
-        
-        target = 3.0  # Minimum 3x interest coverage
-        status = FormulaStatus.PASS if coverage > target else FormulaStatus.FAIL
+        passed, coverage = calc_interest_coverage(operating_income, interest_expense)
         
         return FormulaResult(
-            name="Interest Coverage",
-            description="Operating Profit / Interest Expense > 3×",
-            status=status,
+            formula_id=7,
+            status=_status(passed),
             value=coverage,
-            target=target,
-            details=f"Operating Income: ${operating_income:,.0f}, Interest Expense: ${interest_expense:,.0f}, Coverage: {coverage:.1f}x"
+            raw=(operating_income, interest_expense, coverage)
         )
     
     def earnings_stability(self) -> FormulaResult:
@@ -325,17 +397,13 @@ class BuffettFormulaEngine:
         
         # For single-year analysis, just check if earnings are positive
         # In a full implementation, we would check 10 years of data
-        is_positive = net_income > 0
-        
-        status = FormulaStatus.PASS if is_positive else FormulaStatus.FAIL
+        passed, value = calc_earnings_stability(net_income)
         
         return FormulaResult(
-            name="Earnings Stability",
-            description="Positive earnings (current year)",
-            status=status,
-            value=1.0 if is_positive else 0.0,
-            target=1.0,
-            details=f"Current Net Income: ${net_income:,.0f} ({'Positive' if is_positive else 'Negative'})"
+            formula_id=8,
+            status=_status(passed),
+            value=value,
+            raw=(net_income, 'Positive' if passed else 'Negative')
         )
     
     def capital_allocation(self) -> FormulaResult:
@@ -344,27 +412,172 @@ class BuffettFormulaEngine:
         ROE > 15% (same as Formula 4, but as a value creation check)
         This is Buffett's way of checking if management creates value.
         """
-        # Reuse ROE calculation
-        net_income = self.facts.get('NetIncome', 0)
-        equity = self.facts.get('Equity', 0)
-        
-        if equity <= 0:
-            roe = 0
-        else:
-            roe = (net_income / equity) * 100
-        
-        target = 15.0  # Same as ROE target
-        status = FormulaStatus.PASS if roe > target else FormulaStatus.FAIL
+        # Reuse Formula 4's ROE (computed earlier in evaluate_all)
+        roe = self._roe
+        if roe is None:
+            roe = self.return_on_equity().value
+        passed, roe = calc_capital_allocation(roe)
         
         return FormulaResult(
-            name="Capital Allocation",
-            description="ROE > 15% (value creation)",
-            status=status,
+            formula_id=9,
+            status=_status(passed),
             value=roe,
-            target=target,
-            details=f"ROE: {roe:.1f}% - Management {'creates' if roe > target else 'destroys'} value"
+            raw=(roe, 'creates' if passed else 'destroys')
         )
 
+    # Formulas in evaluation order (plain functions, called with the engine)
+    _FORMULAS = (
+        cash_test,
+        debt_to_equity,
+        free_cash_flow_to_debt,
+        return_on_equity,
+        current_ratio,
+        operating_margin,
+        asset_turnover,
+        interest_coverage,
+        earnings_stability,
+        capital_allocation
+    )
+
+
+if NUMBA_AVAILABLE:
+    # Compiled so that _eval_batch can call them (plain Python callers work unchanged)
+    calc_cash_test = njit(cache=True)(calc_cash_test)
+    calc_debt_to_equity = njit(cache=True)(calc_debt_to_equity)
+    calc_free_cash_flow_to_debt = njit(cache=True)(calc_free_cash_flow_to_debt)
+    calc_return_on_equity = njit(cache=True)(calc_return_on_equity)
+    calc_current_ratio = njit(cache=True)(calc_current_ratio)
+    calc_operating_margin = njit(cache=True)(calc_operating_margin)
+    calc_asset_turnover = njit(cache=True)(calc_asset_turnover)
+    calc_interest_coverage = njit(cache=True)(calc_interest_coverage)
+    calc_earnings_stability = njit(cache=True)(calc_earnings_stability)
+    calc_capital_allocation = njit(cache=True)(calc_capital_allocation)
+    run_all = njit(cache=True)(run_all)
+
+
+def _eval_batch(assets, curr_assets, liab, curr_liab, total_debt, equity, cash, sti,
+                revenue, op_inc, net_inc, int_exp, fcf, out_values, out_pass):
+    """
+    Per-company loop over the fact arrays: runs the formula kernels (run_all)
+    for each company and writes them into out_values / out_pass (N x 10,
+    FORMULA_NAMES order). Compiled with Numba when it is installed.
+    """
+    for i in prange(assets.shape[0]):
+        results = run_all((assets[i], curr_assets[i], liab[i], curr_liab[i], total_debt[i], equity[i],
+                           cash[i], sti[i], revenue[i], op_inc[i], net_inc[i], int_exp[i], fcf[i]))
+        for k in range(len(results)):
+            out_pass[i, k], out_values[i, k] = results[k]
+
+if NUMBA_AVAILABLE:
+    # No fastmath: its no-infs assumption would break the np.inf "no debt" results
+    _eval_batch = njit(parallel=True, cache=True)(_eval_batch)
+
+
+class BatchBuffettEngine:
+    """
+    Evaluates Warren Buffett's 10 investment formulas for many companies at once.
+    Takes one NumPy array per financial fact (one element per company) and
+    computes every formula as a whole-array expression. PASS/FAIL outcomes match
+    BuffettFormulaEngine; missing facts count as 0 as they do there.
+
+    dtype=np.float32 halves memory traffic for large universes; ratios within
+    ~1e-7 (relative) of a threshold may then flip, so float64 is the default.
+    """
+
+    FACTS = FORMULA_FACTS
+
+    FORMULA_NAMES = tuple(meta.name for meta in FORMULA_META)
+
+    def __init__(self, facts: Dict[str, np.ndarray], dtype=np.float64):
+        """
+        Initialize with a struct-of-arrays batch:
+        {'Assets': np.ndarray, 'Equity': np.ndarray, ...}, all of the same length.
+        """
+        self.dtype = np.dtype(dtype)
+        self.facts = {name: np.asarray(values, dtype=self.dtype) for name, values in facts.items()}
+        self.size = len(next(iter(self.facts.values()))) if self.facts else 0
+
+    @classmethod
+    def from_fact_dicts(cls, fact_dicts: List[Dict[str, Any]], dtype=np.float64) -> 'BatchBuffettEngine':
+        """Build a batch from per-company financial_facts dicts."""
+        return cls({
+            name: np.array([facts.get(name, 0) for facts in fact_dicts], dtype=dtype)
+            for name in cls.FACTS
+        }, dtype=dtype)
+
+    def _fact(self, name: str) -> np.ndarray:
+        values = self.facts.get(name)
+        return values if values is not None else np.zeros(self.size, dtype=self.dtype)
+
+    @staticmethod
+    def _divide(numerator, denominator, valid, fallback):
+        """numerator / denominator where valid, fallback elsewhere (no warnings)."""
+        out = np.full(numerator.shape, fallback, dtype=numerator.dtype)
+        return np.divide(numerator, denominator, out=out, where=valid)
+
+    def evaluate_all_batch(self):
+        """
+        Evaluate all 10 formulas for every company.
+        Returns (values, passed): (N, 10) formula values (of the batch dtype) and (N, 10) bool
+        PASS flags, columns in FORMULA_NAMES order.
+        """
+        if NUMBA_AVAILABLE:
+            return self._evaluate_compiled()
+        return self._evaluate_numpy()
+
+    def _evaluate_compiled(self):
+        """evaluate_all_batch via the fused _eval_batch kernel."""
+        values = np.empty((self.size, len(self.FORMULA_NAMES)), dtype=self.dtype)
+        passed = np.empty((self.size, len(self.FORMULA_NAMES)), dtype=np.bool_)
+        _eval_batch(*(self._fact(name) for name in self.FACTS), values, passed)
+        return values, passed
+
+    def _evaluate_numpy(self):
+        """evaluate_all_batch as NumPy whole-array expressions."""
+        total_debt = self._fact('TotalDebt')
+        equity = self._fact('Equity')
+        revenue = self._fact('Revenue')
+        operating_income = self._fact('OperatingIncome')
+        net_income = self._fact('NetIncome')
+        interest_expense = self._fact('InterestExpense')
+        current_liabilities = self._fact('CurrentLiabilities')
+        assets = self._fact('Assets')
+
+        cash = self._fact('CashAndEquivalents') + self._fact('ShortTermInvestments')
+        roe = self._divide(net_income, equity, equity > 0, 0.0) * 100
+
+        values = np.column_stack([
+            self._divide(cash, total_debt, total_debt != 0, np.inf),
+            self._divide(self._fact('Liabilities'), equity, equity > 0, np.inf),
+            self._divide(self._fact('FreeCashFlow'), total_debt, total_debt != 0, np.inf),
+            roe,
+            self._divide(self._fact('CurrentAssets'), current_liabilities, current_liabilities != 0, np.inf),
+            self._divide(operating_income, revenue, revenue != 0, 0.0) * 100,
+            self._divide(revenue, assets, assets != 0, 0.0),
+            self._divide(operating_income, interest_expense, interest_expense != 0, np.inf),
+            (net_income > 0).astype(self.dtype),
+            roe
+        ])
+
+        passed = np.column_stack([
+            values[:, 0] > CASH_RATIO_MIN,
+            values[:, 1] < DEBT_TO_EQUITY_MAX,
+            values[:, 2] > FCF_TO_DEBT_MIN,
+            values[:, 3] > ROE_MIN,
+            values[:, 4] > CURRENT_RATIO_MIN,
+            values[:, 5] > OPERATING_MARGIN_MIN,
+            values[:, 6] > ASSET_TURNOVER_MIN,
+            values[:, 7] > INTEREST_COVERAGE_MIN,
+            net_income > 0,        # Earnings stability
+            values[:, 9] > CAPITAL_ALLOCATION_ROE_MIN
+        ])
+
+        return values, passed
+
+    def pass_counts(self) -> np.ndarray:
+        """Number of formulas passed by each company (what min_buffett_score is checked against)."""
+        return self.evaluate_all_batch()[1].sum(axis=1)
+
 
 def test_buffett_formulas():
     """Test the Buffett formula engine with sample data."""
@@ -396,9 +609,10 @@ def test_buffett_formulas():
     engine = BuffettFormulaEngine(sample_facts)
     results = engine.evaluate_all()
     
-    pass_count = sum(1 for r in results if r.status == FormulaStatus.PASS)
-    fail_count = sum(1 for r in results if r.status == FormulaStatus.FAIL)
-    insufficient_count = sum(1 for r in results if r.status == FormulaStatus.INSUFFICIENT_DATA)
+    counts = Counter(r.status for r in results)
+    pass_count = counts[FormulaStatus.PASS]
+    fail_count = counts[FormulaStatus.FAIL]
+    insufficient_count = counts[FormulaStatus.INSUFFICIENT_DATA]
     
     print(f"\nOverall Score: {pass_count}/10 formulas passed")
     print(f"Pass: {pass_count}, Fail: {fail_count}, Insufficient Data: {insufficient_count}")
@@ -429,4 +643,9 @@ def test_buffett_formulas():
 
 
 if __name__ == "__main__":
+    # Configure logging only when run directly; importers keep their own setup
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s:%(message)s'
+    )
     test_buffett_formulas()
\ No newline at end of file
@@ -19,22 +19,26 @@ def check_database():
     
     print(f"Database found: {db_path}")
     
-    conn = sqlite3.connect(db_path)
+    # Read-only: the check never writes to the database (schema upkeep belongs
+    # to process_indicators.py), and in WAL mode it never blocks a running refresh
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
     cursor = conn.cursor()
     
     try:
-        # Check if stock_indicators table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='stock_indicators'")
-        table_exists = cursor.fetchone()
-        
-        if not table_exists:
+        try:
+            # Row count and freshness in one round-trip (separate scalar subqueries
+            # keep COUNT(*) and MAX() on their index fast paths)
+            cursor.execute(
+                "SELECT (SELECT COUNT(*) FROM stock_indicators), "
+                "(SELECT MAX(data_age_days) FROM stock_indicators)"
+            )
+        except sqlite3.OperationalError as e:
+            if 'no such table' not in str(e):
+                raise
             print("stock_indicators table not found.")
             conn.close()
             return False, "no_table"
-        
-        # Check data count
-        cursor.execute("SELECT COUNT(*) FROM stock_indicators")
-        count = cursor.fetchone()[0]
+        count, max_age = cursor.fetchone()
         print(f"Rows in stock_indicators: {count}")
         
         if count == 0:
@@ -42,10 +46,6 @@ def check_database():
             conn.close()
             return False, "empty_table"
         
-        # Check data freshness
-        cursor.execute("SELECT MAX(data_age_days) FROM stock_indicators")
-        max_age = cursor.fetchone()[0]
-        
         if max_age is None:
             print("Cannot determine data age.")
             conn.close()
@@ -69,51 +69,50 @@ def check_database():
         return False, "error"
 
 def run_data_refresh():
-    """Run the data refresh script."""
+    """
+    Run the data refresh: incremental NASDAQ fetch, then indicator processing.
+    Both scripts are imported and their entry functions called in this process
+    (same working directory, so their ../data/stocks.db paths match ours) instead
+    of running them as child interpreters. Their main()s are not used: they parse
+    sys.argv and don't report failure.
+    """
     print("\nRunning data refresh...")
     
-    # Try to run the existing refresh script
-    refresh_script = '../api/refresh_stocks.py'
-    
-    if os.path.exists(refresh_script):
-        print(f"Found refresh script: {refresh_script}")
+    try:
+        # Imported here: they pull in requests/pandas/talib, which the check doesn't need
+        import incremental_fetch
+        import process_indicators
         
-        # Import and run the refresh
-        import subprocess
-        try:
-            result = subprocess.run(
-                ['python', refresh_script],
-                capture_output=True,
-                text=True,
-                cwd=os.path.dirname(refresh_script)
-            )
-            
-            print(f"Refresh script output:\n{result.stdout}")
-            if result.stderr:
-                print(f"Errors:\n{result.stderr}")
-            
-            if result.returncode == 0:
-                print("Data refresh completed successfully.")
-                return True
-            else:
-                print(f"Data refresh failed with code {result.returncode}.")
-                return False
-                
-        except Exception as e:
-            print(f"Error running refresh script: {e}")
+        symbols = incremental_fetch.get_sp500_symbols()
+        if not symbols:
+            print("Error running data refresh: no S&P 500 symbols found.")
             return False
-    else:
-        print(f"Refresh script not found: {refresh_script}")
         
-        # Try alternative location
-        refresh_script2 = 'refresh_stocks.py'
-        if os.path.exists(refresh_script2):
-            print(f"Found alternative script: {refresh_script2}")
-            # Similar execution logic...
+        total_inserted, success, failed = incremental_fetch.incremental_fetch_all(
+            symbols, max_workers=5, force_full=False
+        )
+        print(f"Fetch: {success} symbols checked, {failed} failed, {total_inserted} new records.")
+        if success == 0:
+            print("Error running data refresh: no symbols could be fetched.")
             return False
-        else:
-            print("No refresh script found. Manual data update needed.")
+        
+        conn = sqlite3.connect(process_indicators.DB_PATH)
+        symbols = process_indicators.get_all_symbols(conn)
+        conn.close()
+        
+        success, failed = process_indicators.process_all_indicators(symbols)
+        print(f"Indicators: {success} symbols calculated, {failed} failed.")
+        if success == 0:
+            print("Error running data refresh: no indicators could be calculated.")
             return False
+        
+        process_indicators.update_statistics()
+    except Exception as e:
+        print(f"Error running data refresh: {e}")
+        return False
+    
+    print("Data refresh completed successfully.")
+    return True
 
 def main():
     """Main function."""
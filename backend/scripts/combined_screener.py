@@ -5,16 +5,18 @@ Finds oversold stocks with strong fundamentals (Buffett formulas).
 """
 
 import sqlite3
+import heapq
 import pandas as pd
+import numpy as np
 import logging
 from datetime import datetime
-import json
+import orjson
 import os
 from typing import List, Dict, Any, Optional
 
 # Import our modules
 from sec_api import SECAPIClient
-from buffett_formulas import BuffettFormulaEngine, FormulaStatus
+from buffett_formulas import BuffettFormulaEngine, BatchBuffettEngine, FormulaStatus
 
 # Configure logging
 logging.basicConfig(
@@ -22,6 +24,28 @@ logging.basicConfig(
     format='%(asctime)s %(levelname)s:%(message)s'
 )
 
+# Price database connection tuning (WAL readers don't block the indicator writer;
+# memory-mapped pages and a 64 MB cache for the oversold scan)
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-65536',
+)
+
+# Fundamentals are fetched in batches of max(top_n * SHORTLIST_FACTOR, MIN_SHORTLIST)
+# oversold stocks, best technical score first (one SEC request each)
+SHORTLIST_FACTOR = 5
+MIN_SHORTLIST = 100
+
+# Combined score = TECHNICAL_WEIGHT * technical + FUNDAMENTAL_WEIGHT * fundamental (both 0-100)
+TECHNICAL_WEIGHT = 0.3
+FUNDAMENTAL_WEIGHT = 0.7
+
+# Results JSON (report and saved file): indented, numpy scalars allowed, NaN as null
+ORJSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+
 class CombinedScreener:
     """
     Screens stocks using:
@@ -34,18 +58,58 @@ class CombinedScreener:
                  price_db_path='../data/stocks.db',
                  sec_cache_db='../data/sec_cache.db',
                  min_buffett_score=5,
-                 technical_threshold=-80.0):
+                 technical_threshold=-80.0,
+                 max_workers=8,
+                 max_candidates=500):
         
         self.price_db_path = price_db_path
         self.sec_client = SECAPIClient(cache_db=sec_cache_db)
         self.min_buffett_score = min_buffett_score
         self.technical_threshold = technical_threshold
+        self.max_workers = max_workers  # Parallel SEC fetches (client enforces SEC's rate limit)
+        self.max_candidates = max_candidates  # Most oversold stocks sent on to SEC analysis
+        self._conn = None
+        self._conn_inode = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def close(self):
+        """Close the price database connection (reopened on next use)."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def _get_connection(self) -> sqlite3.Connection:
+        """
+        Persistent connection to the price database, opened once with SQLITE_PRAGMAS.
+        Reopened if stocks.db is replaced (init_database.py recreates the file).
+        """
+        try:
+            inode = os.stat(self.price_db_path).st_ino
+        except FileNotFoundError:
+            inode = None
+        
+        if self._conn is not None and self._conn_inode == inode:
+            return self._conn
+        self.close()
+        
+        conn = sqlite3.connect(self.price_db_path, check_same_thread=False)
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        self._conn = conn
+        self._conn_inode = inode
+        return conn
         
     def get_oversold_stocks(self) -> pd.DataFrame:
         """Get technically oversold stocks from database."""
-        conn = sqlite3.connect(self.price_db_path)
+        conn = self._get_connection()
         
-        query = f"""
+        # Range scan + ORDER BY on idx_williams_r_21; LIMIT stops it after max_candidates rows
+        query = """
             SELECT
                 symbol,
                 close,
@@ -64,39 +128,51 @@ class CombinedScreener:
                 hist_volatility_20,
                 data_age_days
             FROM stock_indicators
-            WHERE williams_r_21 < {self.technical_threshold}
+            WHERE williams_r_21 < ?
             AND data_age_days <= 1  -- Only fresh data (today or yesterday)
             ORDER BY williams_r_21 ASC
+            LIMIT ?
         """
         
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        df = pd.read_sql_query(query, conn, params=(self.technical_threshold, self.max_candidates))
         
         logging.info(f"Found {len(df)} technically oversold stocks (Williams %R < {self.technical_threshold})")
         return df
     
-    def analyze_fundamentals(self, ticker: str) -> Dict[str, Any]:
-        """Analyze fundamentals using Buffett formulas."""
+    def fetch_financial_facts(self, ticker: str):
+        """
+        Fetch SEC data for a ticker and extract its financial facts.
+        Returns (financial_facts, None) or (None, error message).
+        """
+        return self._facts_from_companyfacts(ticker, self.sec_client.fetch_company_facts(ticker))
+    
+    def _facts_from_companyfacts(self, ticker: str, companyfacts: Optional[Dict[str, Any]]):
+        """Extract financial facts from a companyfacts response; errors become (None, message)."""
+        if not companyfacts:
+            return None, f"Could not fetch SEC data for {ticker}"
+        
         try:
-            # Fetch SEC data
-            companyfacts = self.sec_client.fetch_company_facts(ticker)
-            if not companyfacts:
-                return {
-                    'success': False,
-                    'error': f"Could not fetch SEC data for {ticker}",
-                    'score': 0,
-                    'results': []
-                }
-            
-            # Extract financial facts
             financial_facts = self.sec_client.extract_financial_facts(companyfacts)
-            if not financial_facts or 'facts' not in financial_facts:
-                return {
-                    'success': False,
-                    'error': f"Could not extract financial facts for {ticker}",
-                    'score': 0,
-                    'results': []
-                }
+        except Exception as e:
+            return None, str(e)
+        if not financial_facts or 'facts' not in financial_facts:
+            return None, f"Could not extract financial facts for {ticker}"
+        
+        return financial_facts, None
+    
+    def analyze_fundamentals(self, ticker: str,
+                             financial_facts: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Analyze fundamentals using Buffett formulas (fetching SEC facts unless given)."""
+        try:
+            if financial_facts is None:
+                financial_facts, error = self.fetch_financial_facts(ticker)
+                if error:
+                    return {
+                        'success': False,
+                        'error': error,
+                        'score': 0,
+                        'results': []
+                    }
             
             # Evaluate Buffett formulas
             engine = BuffettFormulaEngine(financial_facts['facts'])
@@ -130,115 +206,105 @@ class CombinedScreener:
                 'results': []
             }
     
-    def calculate_technical_score(self, row: pd.Series) -> float:
-        """Calculate technical score (0-100) based on oversold intensity."""
+    def compute_technical_scores(self, df: pd.DataFrame) -> pd.Series:
+        """Technical score (0-100) for every row, based on oversold intensity."""
         # Williams %R is between -100 and 0, with -100 being most oversold
         # Convert to 0-100 scale where 100 is most oversold
-        williams_r = row['williams_r_21']
+        williams_r = df['williams_r_21'].to_numpy(dtype=float)
         
         # Normalize: (-100 to threshold) -> (100 to 0)
         # More negative = higher score
-        if williams_r <= -100:
-            tech_score = 100
-        elif williams_r >= self.technical_threshold:
-            tech_score = 0
-        else:
-            # Map range [-100, threshold] to [100, 0]
-            tech_score = 100 * (-100 - williams_r) / (-100 - self.technical_threshold)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scaled = 100 * (-100 - williams_r) / (-100 - self.technical_threshold)
+        tech_score = np.where(williams_r <= -100, 100,
+                              np.where(williams_r >= self.technical_threshold, 0, scaled))
         
         # Adjust based on other indicators
-        adjustments = 0
-        
         # RSI confirmation (lower RSI = more oversold)
-        rsi_14 = row['rsi_14']
-        if rsi_14 < 30:
-            adjustments += 10
-        elif rsi_14 < 40:
-            adjustments += 5
+        rsi_14 = df['rsi_14'].to_numpy(dtype=float)
+        tech_score += np.where(rsi_14 < 30, 10, np.where(rsi_14 < 40, 5, 0))
         
         # Distance from 52-week low (closer = more oversold)
-        pct_from_low = row['pct_from_52w_low']
-        if pct_from_low < 10:
-            adjustments += 10
-        elif pct_from_low < 20:
-            adjustments += 5
+        pct_from_low = df['pct_from_52w_low'].to_numpy(dtype=float)
+        tech_score += np.where(pct_from_low < 10, 10, np.where(pct_from_low < 20, 5, 0))
         
         # Bollinger Band position (lower = more oversold)
-        bb_pos = row['bb_position']
-        if bb_pos < 10:
-            adjustments += 10
-        elif bb_pos < 20:
-            adjustments += 5
+        bb_pos = df['bb_position'].to_numpy(dtype=float)
+        tech_score += np.where(bb_pos < 10, 10, np.where(bb_pos < 20, 5, 0))
         
         # Relative volume (high volume on down day = capitulation)
-        rel_vol = row['relative_volume']
-        if rel_vol > 1.5:
-            adjustments += 5
+        rel_vol = df['relative_volume'].to_numpy(dtype=float)
+        tech_score += np.where(rel_vol > 1.5, 5, 0)
         
-        final_score = min(tech_score + adjustments, 100)
-        return final_score
+        return pd.Series(np.minimum(tech_score, 100), index=df.index)
     
-    def screen_stocks(self, top_n: int = 20) -> List[Dict[str, Any]]:
+    def _screen_candidates(self, candidates_df: pd.DataFrame, tech_scores: np.ndarray, positions: np.ndarray):
         """
-        Main screening function:
-        1. Find technically oversold stocks
-        2. Analyze fundamentals for each
-        3. Filter by minimum Buffett score
-        4. Rank by combined score
+        Fetch fundamentals for a batch of oversold stocks and score the ones that
+        pass the minimum Buffett score. Returns (position, stock_data) pairs.
         """
-        logging.info("Starting combined stock screening...")
+        logging.info(f"Analyzing fundamentals for {len(candidates_df)} oversold stocks...")
         
-        # Step 1: Get oversold stocks
-        oversold_df = self.get_oversold_stocks()
-        if oversold_df.empty:
-            logging.warning("No oversold stocks found")
-            return []
+        # Fetch SEC facts for every candidate up front (requests run concurrently)
+        symbols = candidates_df['symbol'].tolist()
+        companyfacts = self.sec_client.fetch_company_facts_bulk(symbols, max_workers=self.max_workers)
+        fetched = [self._facts_from_companyfacts(ticker, companyfacts[ticker]) for ticker in symbols]
+        
+        # Rows as namedtuples of plain Python values (no per-row Series)
+        candidates = []
+        for row, technical_score, position, (financial_facts, error) in zip(
+                candidates_df.itertuples(index=False), tech_scores.tolist(), positions.tolist(), fetched):
+            if error:
+                logging.debug(f"Skipping {row.symbol}: {error}")
+                continue
+            candidates.append((row, technical_score, position, financial_facts))
         
-        logging.info(f"Analyzing fundamentals for {len(oversold_df)} oversold stocks...")
+        # Buffett scores for all candidates in one vectorized pass
+        pass_counts = BatchBuffettEngine.from_fact_dicts(
+            [financial_facts['facts'] for _, _, _, financial_facts in candidates]
+        ).pass_counts()
         
-        screened_stocks = []
+        screened = []
         
-        for _, row in oversold_df.iterrows():
-            ticker = row['symbol']
+        for (row, technical_score, position, financial_facts), pass_count in zip(candidates, pass_counts):
+            ticker = row.symbol
             
-            # Step 2: Analyze fundamentals
-            fundamental_result = self.analyze_fundamentals(ticker)
+            # Check minimum Buffett score
+            if pass_count < self.min_buffett_score:
+                logging.debug(f"Skipping {ticker}: Buffett score {pass_count}/10 < minimum {self.min_buffett_score}")
+                continue
             
+            # Full formula results only for the stocks that made the cut
+            fundamental_result = self.analyze_fundamentals(ticker, financial_facts)
             if not fundamental_result['success']:
                 logging.debug(f"Skipping {ticker}: {fundamental_result.get('error', 'Unknown error')}")
                 continue
-            
-            # Step 3: Check minimum Buffett score
             pass_count = fundamental_result['pass_count']
-            if pass_count < self.min_buffett_score:
-                logging.debug(f"Skipping {ticker}: Buffett score {pass_count}/10 < minimum {self.min_buffett_score}")
-                continue
             
-            # Step 4: Calculate scores
-            technical_score = self.calculate_technical_score(row)
+            # Calculate scores
             fundamental_score = fundamental_result['score']  # 0-100
             
             # Combined score: 30% technical + 70% fundamental
-            combined_score = (technical_score * 0.3) + (fundamental_score * 0.7)
+            combined_score = (technical_score * TECHNICAL_WEIGHT) + (fundamental_score * FUNDAMENTAL_WEIGHT)
             
             # Prepare stock data
             stock_data = {
                 'ticker': ticker,
                 'company_name': fundamental_result.get('company_name', ticker),
-                'close_price': float(row['close']),
+                'close_price': row.close,
                 'technical_indicators': {
-                    'williams_r_21': float(row['williams_r_21']),
-                    'rsi_14': float(row['rsi_14']),
-                    'rsi_21': float(row['rsi_21']),
-                    'ema_williams_r': float(row['ema_13_williams_r']),
-                    'adx_14': float(row['adx_14']),
-                    'price_vs_sma200_pct': float(row['price_vs_sma200_pct']),
-                    'pct_from_52w_high': float(row['pct_from_52w_high']),
-                    'pct_from_52w_low': float(row['pct_from_52w_low']),
-                    'bb_position': float(row['bb_position']),
-                    'relative_volume': float(row['relative_volume']),
-                    'macd_hist': float(row['macd_hist']),
-                    'hist_volatility': float(row['hist_volatility_20'])
+                    'williams_r_21': row.williams_r_21,
+                    'rsi_14': row.rsi_14,
+                    'rsi_21': row.rsi_21,
+                    'ema_williams_r': row.ema_13_williams_r,
+                    'adx_14': row.adx_14,
+                    'price_vs_sma200_pct': row.price_vs_sma200_pct,
+                    'pct_from_52w_high': row.pct_from_52w_high,
+                    'pct_from_52w_low': row.pct_from_52w_low,
+                    'bb_position': row.bb_position,
+                    'relative_volume': row.relative_volume,
+                    'macd_hist': row.macd_hist,
+                    'hist_volatility': row.hist_volatility_20
                 },
                 'fundamental_analysis': {
                     'buffett_score': pass_count,
@@ -253,23 +319,75 @@ class CombinedScreener:
                     'combined': combined_score
                 },
                 'data_freshness': {
-                    'price_data_age_days': int(row['data_age_days']),
+                    'price_data_age_days': row.data_age_days,
                     'analysis_timestamp': datetime.now().isoformat()
                 }
             }
             
-            screened_stocks.append(stock_data)
+            screened.append((position, stock_data))
         
-        # Step 5: Sort by combined score (descending)
-        screened_stocks.sort(key=lambda x: x['scores']['combined'], reverse=True)
+        return screened
+    
+    def screen_stocks(self, top_n: int = 20) -> List[Dict[str, Any]]:
+        """
+        Main screening function:
+        1. Find technically oversold stocks
+        2. Analyze fundamentals, technically strongest first, until the rest cannot make the top N
+        3. Filter by minimum Buffett score
+        4. Rank by combined score
+        """
+        logging.info("Starting combined stock screening...")
         
-        # Step 6: Return top N
-        top_stocks = screened_stocks[:top_n]
+        # Step 1: Get oversold stocks
+        oversold_df = self.get_oversold_stocks()
+        if oversold_df.empty:
+            logging.warning("No oversold stocks found")
+            return []
+        
+        # Technical scores for all oversold stocks at once. Fundamentals (network-bound)
+        # are fetched in batches, best technical score first, and only until no
+        # remaining stock can reach the top N: its combined score is at most
+        # TECHNICAL_WEIGHT * technical + FUNDAMENTAL_WEIGHT * 100, and technical
+        # scores only fall from batch to batch.
+        tech_scores = self.compute_technical_scores(oversold_df).to_numpy()
+        order = np.argsort(-tech_scores, kind='stable')
+        batch_size = max(top_n * SHORTLIST_FACTOR, MIN_SHORTLIST)
+        
+        screened = []  # (row position in oversold_df, stock_data)
+        for start in range(0, len(order), batch_size):
+            if len(screened) >= top_n:
+                nth_best = heapq.nlargest(top_n, (stock['scores']['combined'] for _, stock in screened))[-1]
+                best_possible = TECHNICAL_WEIGHT * tech_scores[order[start]] + FUNDAMENTAL_WEIGHT * 100
+                if nth_best > best_possible:
+                    logging.info(f"Skipping fundamentals for {len(order) - start} stocks that cannot reach the top {top_n}")
+                    break
+            positions = order[start:start + batch_size]
+            screened.extend(self._screen_candidates(oversold_df.iloc[positions], tech_scores[positions], positions))
+        
+        # Back to query order, so ties in combined score rank as they would without batching
+        screened.sort(key=lambda item: item[0])
+        screened_stocks = [stock for _, stock in screened]
+        
+        # Steps 5-6: Top N by combined score (descending), without sorting the rest
+        top_stocks = heapq.nlargest(top_n, screened_stocks, key=lambda x: x['scores']['combined'])
         
         logging.info(f"Screening complete. Found {len(top_stocks)} quality oversold stocks.")
         
         return top_stocks
     
+    def _results_document(self, screened_stocks: List[Dict[str, Any]],
+                          summary: Dict[str, Any]) -> Dict[str, Any]:
+        """Wrap screening results with timestamp and criteria (JSON report and saved file)."""
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'criteria': {
+                'technical_threshold': self.technical_threshold,
+                'min_buffett_score': self.min_buffett_score
+            },
+            'summary': summary,
+            'stocks': screened_stocks
+        }
+    
     def generate_report(self, screened_stocks: List[Dict[str, Any]], 
                        output_format: str = 'text') -> str:
         """Generate human-readable report."""
@@ -290,25 +408,27 @@ class CombinedScreener:
             report_lines.append("")
             
             for i, stock in enumerate(screened_stocks, 1):
-                report_lines.append(f"{i}. {stock['ticker']} - {stock['company_name']}")
-                report_lines.append(f"   Price: ${stock['close_price']:.2f}")
-                report_lines.append(f"   Scores: Technical {stock['scores']['technical']:.1f}/100 | "
-                                  f"Fundamental {stock['scores']['fundamental']:.1f}/100 | "
-                                  f"Combined {stock['scores']['combined']:.1f}/100")
-                report_lines.append(f"   Buffett Score: {stock['fundamental_analysis']['buffett_score']}/10 formulas passed")
-                
-                # Technical highlights
+                scores = stock['scores']
                 tech = stock['technical_indicators']
-                report_lines.append(f"   Technical: Williams %R {tech['williams_r_21']:.1f} | "
-                                  f"RSI {tech['rsi_14']:.1f} | "
-                                  f"vs 200-day SMA: {tech['price_vs_sma200_pct']:.1f}%")
-                
-                # Fundamental highlights
                 fund = stock['fundamental_analysis']
                 key_facts = fund.get('key_financials', {})
                 
-                if 'Revenue' in key_facts:
-                    revenue = key_facts['Revenue']
+                # Header, scores and technical highlights as one block
+                report_lines.append(
+                    f"{i}. {stock['ticker']} - {stock['company_name']}\n"
+                    f"   Price: ${stock['close_price']:.2f}\n"
+                    f"   Scores: Technical {scores['technical']:.1f}/100 | "
+                    f"Fundamental {scores['fundamental']:.1f}/100 | "
+                    f"Combined {scores['combined']:.1f}/100\n"
+                    f"   Buffett Score: {fund['buffett_score']}/10 formulas passed\n"
+                    f"   Technical: Williams %R {tech['williams_r_21']:.1f} | "
+                    f"RSI {tech['rsi_14']:.1f} | "
+                    f"vs 200-day SMA: {tech['price_vs_sma200_pct']:.1f}%"
+                )
+                
+                # Fundamental highlights
+                revenue = key_facts.get('Revenue')
+                if revenue is not None:
                     if revenue > 1_000_000_000:
                         revenue_str = f"${revenue/1_000_000_000:.1f}B"
                     elif revenue > 1_000_000:
@@ -317,28 +437,16 @@ class CombinedScreener:
                         revenue_str = f"${revenue:,.0f}"
                     report_lines.append(f"   Revenue: {revenue_str}")
                 
-                if 'NetIncome' in key_facts:
-                    net_income = key_facts['NetIncome']
-                    if net_income > 0:
-                        report_lines.append(f"   Net Income: ${net_income/1_000_000:.1f}M (positive)")
-                    else:
-                        report_lines.append(f"   Net Income: ${net_income/1_000_000:.1f}M (negative)")
+                net_income = key_facts.get('NetIncome')
+                if net_income is not None:
+                    sign = 'positive' if net_income > 0 else 'negative'
+                    report_lines.append(f"   Net Income: ${net_income/1_000_000:.1f}M ({sign})")
                 
                 report_lines.append("")
         
         elif output_format == 'json':
-            report = {
-                'timestamp': datetime.now().isoformat(),
-                'criteria': {
-                    'technical_threshold': self.technical_threshold,
-                    'min_buffett_score': self.min_buffett_score
-                },
-                'summary': {
-                    'total_found': len(screened_stocks)
-                },
-                'stocks': screened_stocks
-            }
-            return json.dumps(report, indent=2)
+            report = self._results_document(screened_stocks, {'total_found': len(screened_stocks)})
+            return orjson.dumps(report, option=ORJSON_OPTIONS).decode()
         
         elif output_format == 'telegram':
             # Compact format for Telegram
@@ -348,6 +456,7 @@ class CombinedScreener:
             report_lines.append("")
             
             for i, stock in enumerate(screened_stocks[:10], 1):  # Top 10 for Telegram
+                tech = stock['technical_indicators']
                 buffett_score = stock['fundamental_analysis']['buffett_score']
                 combined_score = stock['scores']['combined']
                 
@@ -359,11 +468,11 @@ class CombinedScreener:
                 else:
                     emoji = "🟠"
                 
-                report_lines.append(f"{emoji} *{stock['ticker']}* - ${stock['close_price']:.2f}")
-                report_lines.append(f"  Buffett: {buffett_score}/10 | Combined: {combined_score:.0f}/100")
-                report_lines.append(f"  Williams %R: {stock['technical_indicators']['williams_r_21']:.1f} | "
-                                  f"RSI: {stock['technical_indicators']['rsi_14']:.1f}")
-                report_lines.append("")
+                report_lines.append(
+                    f"{emoji} *{stock['ticker']}* - ${stock['close_price']:.2f}\n"
+                    f"  Buffett: {buffett_score}/10 | Combined: {combined_score:.0f}/100\n"
+                    f"  Williams %R: {tech['williams_r_21']:.1f} | RSI: {tech['rsi_14']:.1f}\n"
+                )
         
         return "\n".join(report_lines)
     
@@ -376,20 +485,11 @@ class CombinedScreener:
         filename = f"combined_screener_{timestamp}.json"
         filepath = os.path.join(output_dir, filename)
         
-        results = {
-            'timestamp': datetime.now().isoformat(),
-            'criteria': {
-                'technical_threshold': self.technical_threshold,
-                'min_buffett_score': self.min_buffett_score
-            },
-            'summary': {
-                'total_stocks_screened': len(screened_stocks)
-            },
-            'stocks': screened_stocks
-        }
+        results = self._results_document(screened_stocks, {'total_stocks_screened': len(screened_stocks)})
         
-        with open(filepath, 'w') as f:
-            json.dump(results, f, indent=2)
+        # orjson writes bytes directly
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(results, option=ORJSON_OPTIONS))
         
         logging.info(f"Results saved to {filepath}")
         return filepath
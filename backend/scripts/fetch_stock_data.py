@@ -2,11 +2,11 @@
 
 import pandas as pd
 import yfinance as yf
+import gzip
 import os
-import json
+import orjson
 from datetime import datetime
 import logging
-import concurrent.futures
 import re
 import time
 
@@ -17,19 +17,28 @@ logging.basicConfig(
     format='%(asctime)s %(levelname)s:%(message)s'
 )
 
+# Characters not allowed in a filename (anything but alphanumerics, '_' and '-')
+SAFE_FILENAME_RE = re.compile(r'[^\w\-]')
+
+# Symbols per batched yfinance download (keeps request URLs a reasonable length)
+DOWNLOAD_CHUNK_SIZE = 100
+
+# Files written within this many hours are current (at most one new daily bar a day)
+MAX_FILE_AGE_HOURS = 6
+
 def sanitize_filename(symbol):
     """
     Sanitizes the stock symbol to create a safe filename.
     Replaces any character that's not alphanumeric or '-' with '_'.
     """
-    return re.sub(r'[^\w\-]', '_', symbol)
+    return SAFE_FILENAME_RE.sub('_', symbol)
 
 def get_sp500_symbols(csv_path='../data/sp500_companies.csv'):
     """
     Reads the S&P 500 companies CSV and returns a list of ticker symbols.
     """
     try:
-        df = pd.read_csv(csv_path)
+        df = pd.read_csv(csv_path, usecols=['Symbol'], dtype={'Symbol': str})
         symbols = df['Symbol'].tolist()
         logging.info(f"Retrieved {len(symbols)} symbols from {csv_path}.")
         return symbols
@@ -37,67 +46,95 @@ def get_sp500_symbols(csv_path='../data/sp500_companies.csv'):
         logging.error(f"Error reading S&P 500 companies CSV: {e}")
         return []
 
-def fetch_and_save_historical(symbol, output_dir='../data/stocks/historical'):
+def historical_file_path(symbol, output_dir='../data/stocks/historical'):
+    """Path of the gzip-compressed JSON file holding a symbol's historical data."""
+    safe_symbol = sanitize_filename(symbol)
+    filename = f"{safe_symbol}.json.gz"
+    return os.path.join(output_dir, filename)
+
+def is_file_current(file_path):
+    """True if file_path exists, is non-empty and was written less than MAX_FILE_AGE_HOURS ago."""
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
+        return False
+    return st.st_size > 0 and time.time() - st.st_mtime < MAX_FILE_AGE_HOURS * 3600
+
+def save_historical(symbol, hist, output_dir='../data/stocks/historical'):
     """
-    Fetches the last 2 years of stock data for a given symbol and saves it as a JSON file.
-    2 years provides ~500 trading days, ensuring sufficient data for long-period indicators like SMA_200.
+    Saves one symbol's daily bars (DataFrame indexed by Date) as a gzip-compressed JSON file.
     """
-    try:
-        stock = yf.Ticker(symbol)
-        hist = stock.history(period='2y', interval='1d')  # Fetch the last 2 years (~500 trading days)
+    # Reset index to get 'Date' as a column
+    hist = hist.reset_index()
 
-        if hist.empty:
-            logging.error(f"❌ FAILED to fetch data for {symbol}: Yahoo Finance returned no data. Possible causes: delisted stock, API issue, or incorrect system date.")
-            return
+    # Convert Timestamp to string for JSON serialization
+    hist['Date'] = hist['Date'].dt.strftime('%Y-%m-%d')
 
-        # Reset index to get 'Date' as a column
-        hist.reset_index(inplace=True)
+    # Convert DataFrame to dictionary
+    data = {
+        'Symbol': symbol,
+        'Historical_Data': hist.to_dict(orient='records')
+    }
 
-        # Convert Timestamp to string for JSON serialization
-        hist['Date'] = hist['Date'].dt.strftime('%Y-%m-%d')
+    file_path = historical_file_path(symbol, output_dir)
 
-        # Convert DataFrame to dictionary
-        data = hist.to_dict(orient='records')
-        data = {
-            'Symbol': symbol,
-            'Historical_Data': data
-        }
+    # Save to JSON (orjson writes bytes directly; NaN becomes null). The repeated
+    # record keys compress ~10x, and level 3 keeps compression cheap.
+    with gzip.open(file_path, 'wb', compresslevel=3) as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY))
 
-        # Sanitize filename
-        safe_symbol = sanitize_filename(symbol)
-        filename = f"{safe_symbol}.json"
-        file_path = os.path.join(output_dir, filename)
+    logging.info(f"Fetched and saved historical data for {symbol} to {file_path}")
 
-        # Save to JSON
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+def fetch_chunk(symbols, output_dir='../data/stocks/historical'):
+    """
+    Fetches the last 2 years of daily bars for a chunk of symbols in one batched
+    yfinance download and saves each symbol as a JSON file.
+    2 years provides ~500 trading days, ensuring sufficient data for long-period indicators like SMA_200.
+    """
+    # auto_adjust/actions match Ticker.history(): adjusted OHLC plus Dividends and Stock Splits
+    data = yf.download(symbols, period='2y', interval='1d', group_by='ticker',
+                       auto_adjust=True, actions=True, threads=True, progress=False)
 
-        logging.info(f"Fetched and saved historical data for {symbol} to {file_path}")
+    # Columns are (symbol, field); older yfinance returns flat columns for a single ticker
+    grouped = isinstance(data.columns, pd.MultiIndex)
+    fetched = set(data.columns.get_level_values(0)) if grouped else set(symbols)
 
-    except Exception as e:
-        logging.error(f"Error fetching data for {symbol}: {e}")
+    for symbol in symbols:
+        try:
+            hist = data[symbol] if grouped and symbol in fetched else data
+
+            # Rows come from the union of all symbols' dates; drop the ones this symbol lacks
+            if symbol in fetched:
+                hist = hist.dropna(subset=['Close'])
+            if symbol not in fetched or hist.empty:
+                logging.error(f"❌ FAILED to fetch data for {symbol}: Yahoo Finance returned no data. Possible causes: delisted stock, API issue, or incorrect system date.")
+                continue
+
+            save_historical(symbol, hist, output_dir)
+        except Exception as e:
+            logging.error(f"Error saving data for {symbol}: {e}")
 
 def fetch_stock_data(symbols, output_dir='../data/stocks/historical'):
     """
-    Fetches historical stock price data for the given symbols using yfinance and saves each as a separate JSON file.
-    Utilizes multithreading for faster execution while respecting rate limits.
+    Fetches historical stock price data for the given symbols using yfinance and saves each as a separate .json.gz file.
+    Symbols are downloaded in batched requests of DOWNLOAD_CHUNK_SIZE instead of one request per symbol;
+    symbols whose file is already current (see is_file_current) are skipped.
     """
     try:
         logging.info("Starting to fetch historical stock data...")
         os.makedirs(output_dir, exist_ok=True)
 
-        # To respect rate limits, limit the number of workers and add slight delays if necessary
-        max_workers = 10  # Adjust based on system capabilities and rate limits
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(fetch_and_save_historical, symbol, output_dir): symbol for symbol in symbols}
-            for future in concurrent.futures.as_completed(futures):
-                symbol = futures[future]
-                try:
-                    future.result()
-                    # Optional: Add a short sleep to prevent hitting rate limits
-                    time.sleep(0.1)
-                except Exception as e:
-                    logging.error(f"Unhandled exception for {symbol}: {e}")
+        stale = [symbol for symbol in symbols if not is_file_current(historical_file_path(symbol, output_dir))]
+        if len(stale) < len(symbols):
+            logging.info(f"Skipping {len(symbols) - len(stale)} symbols with current data files")
+        symbols = stale
+
+        for i in range(0, len(symbols), DOWNLOAD_CHUNK_SIZE):
+            chunk = symbols[i:i + DOWNLOAD_CHUNK_SIZE]
+            try:
+                fetch_chunk(chunk, output_dir)
+            except Exception as e:
+                logging.error(f"Error fetching data for {chunk[0]}..{chunk[-1]}: {e}")
 
         logging.info("Completed fetching historical stock data.")
 
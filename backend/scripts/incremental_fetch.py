@@ -6,7 +6,10 @@ Only fetches new data since the last update, making daily updates fast and effic
 
 import sqlite3
 import requests
+import threading
 import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
 import logging
 import concurrent.futures
@@ -22,23 +25,54 @@ logging.basicConfig(
 
 DB_PATH = '../data/stocks.db'
 
+# Writer connection tuning: WAL so the API and screener keep reading while we
+# write, NORMAL sync (no fsync on each per-symbol commit), and a busy timeout
+# instead of failing if another writer holds the lock
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+)
+
+NASDAQ_HEADERS = {
+    "accept": "*/*",
+    "referer": "https://charting.nasdaq.com/dynamic/chart.html",
+    "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
+}
+
+# One HTTP session per fetch worker thread (keeps the connection to NASDAQ alive)
+_local = threading.local()
+
+def get_session():
+    """
+    This thread's NASDAQ session, retrying transient gateway errors and rate
+    limiting (429). NASDAQ traffic is bounded by the fetch worker count (as it
+    always was); a 429 backs off and honours the server's Retry-After header.
+    """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(NASDAQ_HEADERS)
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504],
+                      respect_retry_after_header=True, raise_on_status=False)
+        session.mount('https://', HTTPAdapter(max_retries=retry))
+        _local.session = session
+    return session
+
 def get_sp500_symbols(csv_path='../data/sp500_companies.csv'):
     """Read S&P 500 symbols from CSV."""
     try:
-        df = pd.read_csv(csv_path)
+        df = pd.read_csv(csv_path, usecols=['Symbol'], dtype={'Symbol': str})
         return df['Symbol'].tolist()
     except Exception as e:
         logging.error(f"Error reading S&P 500 companies: {e}")
         return []
 
-def get_latest_date(symbol, conn):
-    """Get the latest date we have data for this symbol."""
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT MAX(date) FROM historical_prices WHERE symbol = ?
-    ''', (symbol,))
-    result = cursor.fetchone()
-    return result[0] if result[0] else None
+def get_all_latest_dates(conn):
+    """Latest date we have data for, for every symbol (one grouped scan of the index)."""
+    return dict(conn.execute('''
+        SELECT symbol, MAX(date) FROM historical_prices GROUP BY symbol
+    ''').fetchall())
 
 def fetch_nasdaq_incremental(symbol, start_date, end_date=None):
     """
@@ -48,6 +82,9 @@ def fetch_nasdaq_incremental(symbol, start_date, end_date=None):
         symbol: Stock ticker
         start_date: Start date (YYYY-MM-DD or datetime)
         end_date: End date (defaults to today)
+
+    Returns: DataFrame, or None if NASDAQ has no data for the range.
+    Raises requests.RequestException if the request fails.
     """
     if end_date is None:
         end_date = datetime.now()
@@ -61,32 +98,21 @@ def fetch_nasdaq_incremental(symbol, start_date, end_date=None):
 
     url = "https://charting.nasdaq.com/data/charting/historical"
     params = {"symbol": symbol, "date": date_range}
-    headers = {
-        "accept": "*/*",
-        "referer": "https://charting.nasdaq.com/dynamic/chart.html",
-        "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-    }
 
-    try:
-        response = requests.get(url, params=params, headers=headers, timeout=15)
-
-        if response.status_code == 200:
-            data = response.json()
-            if 'marketData' in data and len(data['marketData']) > 0:
-                market_data = data['marketData']
-                df = pd.DataFrame(market_data)
-                df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
-                df['Dividends'] = 0.0
-                df['Stock Splits'] = 0.0
-                return df
-            else:
-                return None
-        else:
-            logging.error(f"NASDAQ API error for {symbol}: HTTP {response.status_code}")
-            return None
-
-    except Exception as e:
-        logging.error(f"Error fetching {symbol}: {e}")
+    # Errors propagate, so incremental_fetch_all counts a failed request as a
+    # failure rather than as a symbol with no new data
+    response = get_session().get(url, params=params, timeout=15)
+    response.raise_for_status()
+
+    data = response.json()
+    if 'marketData' in data and len(data['marketData']) > 0:
+        market_data = data['marketData']
+        df = pd.DataFrame(market_data)
+        df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
+        df['Dividends'] = 0.0
+        df['Stock Splits'] = 0.0
+        return df
+    else:
         return None
 
 def insert_historical_data(symbol, df, conn):
@@ -94,63 +120,68 @@ def insert_historical_data(symbol, df, conn):
     if df is None or len(df) == 0:
         return 0
 
-    cursor = conn.cursor()
-    inserted = 0
-
-    for _, row in df.iterrows():
-        try:
-            cursor.execute('''
-                INSERT OR REPLACE INTO historical_prices
-                (symbol, date, open, high, low, close, volume, dividends, stock_splits)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                symbol,
-                row['Date'],
-                row['Open'],
-                row['High'],
-                row['Low'],
-                row['Close'],
-                row['Volume'],
-                row.get('Dividends', 0.0),
-                row.get('Stock Splits', 0.0)
-            ))
-            inserted += 1
-        except sqlite3.IntegrityError:
-            pass  # Already exists
-        except Exception as e:
-            logging.error(f"Error inserting {symbol} {row['Date']}: {e}")
+    # Store OHLCV as numbers so process_indicators.py can use the rows as read;
+    # rows with a missing or non-numeric price are not stored
+    ohlcv = ['Open', 'High', 'Low', 'Close', 'Volume']
+    df = df.copy()
+    df[ohlcv] = df[ohlcv].apply(pd.to_numeric, errors='coerce')
+    df = df.dropna(subset=ohlcv)
+    if len(df) == 0:
+        return 0
+
+    # One statement for all rows, committed as one transaction. tolist() gives
+    # plain Python values (sqlite3 can't bind numpy integers)
+    rows = list(zip(
+        [symbol] * len(df),
+        df['Date'].tolist(),
+        df['Open'].tolist(),
+        df['High'].tolist(),
+        df['Low'].tolist(),
+        df['Close'].tolist(),
+        df['Volume'].tolist(),
+        df['Dividends'].tolist() if 'Dividends' in df else [0.0] * len(df),
+        df['Stock Splits'].tolist() if 'Stock Splits' in df else [0.0] * len(df)
+    ))
 
-    conn.commit()
-    return inserted
+    try:
+        conn.executemany('''
+            INSERT OR REPLACE INTO historical_prices
+            (symbol, date, open, high, low, close, volume, dividends, stock_splits)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+    except Exception as e:
+        logging.error(f"Error inserting {symbol}: {e}")
+        return 0
+
+    return len(rows)
 
-def ensure_stock_exists(symbol, conn):
-    """Ensure stock entry exists in stocks table."""
-    cursor = conn.cursor()
-    cursor.execute('''
+def ensure_stocks_exist(symbols, conn):
+    """Ensure stock entries exist in stocks table."""
+    now = datetime.now().isoformat()
+    conn.executemany('''
         INSERT OR IGNORE INTO stocks (symbol, last_updated)
         VALUES (?, ?)
-    ''', (symbol, datetime.now().isoformat()))
+    ''', [(symbol, now) for symbol in symbols])
     conn.commit()
 
-def incremental_fetch_symbol(symbol, conn, force_full=False):
+def fetch_symbol_update(symbol, force_full=False, latest_date=None):
     """
-    Fetch only new data for a symbol since last update.
+    Fetch only new data for a symbol since last update (network only, no database access).
 
     Args:
         symbol: Stock ticker
-        conn: Database connection
         force_full: If True, fetch all 2 years of data
-    """
-    ensure_stock_exists(symbol, conn)
+        latest_date: Latest date already stored for the symbol (None if no data yet)
 
+    Returns: DataFrame of new rows, or None if there is nothing new.
+    Raises if the NASDAQ request fails.
+    """
     if force_full:
         # Fetch 2 years of data
         start_date = datetime.now() - timedelta(days=730)
         logging.info(f"{symbol}: Full fetch (2 years)")
     else:
-        # Get latest date we have
-        latest_date = get_latest_date(symbol, conn)
-
         if latest_date:
             # Fetch from day after latest date
             start_date = datetime.strptime(latest_date, '%Y-%m-%d') + timedelta(days=1)
@@ -158,7 +189,7 @@ def incremental_fetch_symbol(symbol, conn, force_full=False):
 
             if days_behind <= 0:
                 logging.info(f"{symbol}: Up to date (latest: {latest_date})")
-                return 0
+                return None
 
             logging.info(f"{symbol}: Incremental fetch ({days_behind} days behind)")
         else:
@@ -169,28 +200,34 @@ def incremental_fetch_symbol(symbol, conn, force_full=False):
     # Fetch data
     df = fetch_nasdaq_incremental(symbol, start_date)
 
-    if df is not None:
-        inserted = insert_historical_data(symbol, df, conn)
-        logging.info(f"{symbol}: Inserted {inserted} new records")
-        return inserted
-    else:
+    if df is None:
         logging.warning(f"{symbol}: No new data available")
-        return 0
+    return df
 
 def incremental_fetch_all(symbols, max_workers=5, force_full=False):
     """
     Incrementally fetch new data for all symbols.
+    Worker threads only do the HTTP requests; this thread owns the database
+    connection and writes each symbol's rows as its fetch completes.
 
     Args:
         symbols: List of stock symbols
         max_workers: Number of parallel workers
         force_full: If True, fetch full 2 years for all stocks
+
+    Returns: (rows inserted, symbols fetched, symbols whose fetch failed)
     """
     print(f"Starting {'FULL' if force_full else 'INCREMENTAL'} fetch for {len(symbols)} symbols...")
     print(f"Workers: {max_workers}")
     print()
 
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn = sqlite3.connect(DB_PATH)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    ensure_stocks_exist(symbols, conn)
+
+    # Latest stored date per symbol, read once for all workers
+    latest_dates = {} if force_full else get_all_latest_dates(conn)
 
     total_inserted = 0
     success_count = 0
@@ -198,24 +235,24 @@ def incremental_fetch_all(symbols, max_workers=5, force_full=False):
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
         futures = {
-            executor.submit(incremental_fetch_symbol, symbol, conn, force_full): symbol
+            executor.submit(fetch_symbol_update, symbol, force_full, latest_dates.get(symbol)): symbol
             for symbol in symbols
         }
 
         for i, future in enumerate(concurrent.futures.as_completed(futures), 1):
             symbol = futures[future]
             try:
-                inserted = future.result()
-                total_inserted += inserted
+                df = future.result()
+                if df is not None:
+                    inserted = insert_historical_data(symbol, df, conn)
+                    logging.info(f"{symbol}: Inserted {inserted} new records")
+                    total_inserted += inserted
                 success_count += 1
 
                 # Progress
                 if i % 50 == 0:
                     print(f"Progress: {i}/{len(symbols)} symbols processed...")
 
-                # Rate limiting
-                time.sleep(0.3)
-
             except Exception as e:
                 fail_count += 1
                 logging.error(f"Error processing {symbol}: {e}")
@@ -9,7 +9,9 @@ import pandas as pd
 import talib
 from datetime import datetime
 import logging
+import math
 import concurrent.futures
+import os
 import time
 
 # Configure logging
@@ -21,46 +23,105 @@ logging.basicConfig(
 
 DB_PATH = '../data/stocks.db'
 
+# Days of history loaded per symbol, counted back from the newest stored date.
+# Two years (~500 trading days) is what incremental_fetch.py fetches initially:
+# enough for SMA-200/52-week windows and for EMA-200 to settle, while the load
+# no longer grows with every day appended to historical_prices.
+HISTORY_WINDOW_DAYS = 730
+
+# Upsert of one stock_indicators row (values in column order, see calculate_indicators)
+INSERT_INDICATORS_SQL = '''
+    INSERT OR REPLACE INTO stock_indicators (
+        symbol, date, open, high, low, close, volume, data_age_days,
+        williams_r_14, williams_r_21, ema_13_williams_r, rsi_14, rsi_21,
+        macd, macd_signal, macd_hist, stoch_k, stoch_d,
+        roc_10, roc_20, cci_14, cci_20, mfi_14,
+        ema_9, ema_20, ema_50, ema_200, sma_20, sma_50, sma_200,
+        adx_14, plus_di, minus_di, sar,
+        atr_14, atr_20, bb_upper, bb_middle, bb_lower, stddev_20, bb_width, atr_pct, hist_volatility_20,
+        obv, ad, adosc, volume_ma_20, volume_ma_50, relative_volume,
+        price_vs_sma20_pct, price_vs_sma50_pct, price_vs_sma200_pct, bb_position,
+        high_52w, low_52w, pct_from_52w_high, pct_from_52w_low, range_52w_position,
+        last_calculated
+    ) VALUES (
+        ?, ?, ?, ?, ?, ?, ?, ?,
+        ?, ?, ?, ?, ?,
+        ?, ?, ?, ?, ?,
+        ?, ?, ?, ?, ?,
+        ?, ?, ?, ?, ?, ?, ?,
+        ?, ?, ?, ?,
+        ?, ?, ?, ?, ?, ?, ?, ?, ?,
+        ?, ?, ?, ?, ?, ?,
+        ?, ?, ?, ?,
+        ?, ?, ?, ?, ?,
+        ?
+    )
+'''
+
+def finite_or_none(value):
+    """Store NaN/Infinity as NULL so readers can serve values without re-checking them."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+# PRAGMA user_version once null_non_finite_indicators has run on a database
+NON_FINITE_CLEANUP_VERSION = 1
+
+def null_non_finite_indicators(conn):
+    """
+    One-time migration: NULL out the +/-Infinity that stock_indicators rows got
+    before this script stored non-finite values as NULL (SQLite already
+    stores NaN as NULL). Runs once per database, tracked in PRAGMA user_version.
+    """
+    if conn.execute('PRAGMA user_version').fetchone()[0] >= NON_FINITE_CLEANUP_VERSION:
+        return
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(stock_indicators)') if row[2] == 'REAL']
+    for column in columns:
+        conn.execute(f'UPDATE stock_indicators SET {column} = NULL WHERE {column} IN (9e999, -9e999)')
+    conn.execute(f'PRAGMA user_version = {NON_FINITE_CLEANUP_VERSION}')
+    conn.commit()
+
+def prepare_indicator_table(conn):
+    """Bring databases created by older init_database.py versions up to date."""
+    # Older databases predate idx_data_age_days; with it check_database's MAX() is a single seek
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_data_age_days ON stock_indicators(data_age_days)')
+    null_non_finite_indicators(conn)
+
 def get_all_symbols(conn):
     """Get all stock symbols from database."""
     cursor = conn.cursor()
     cursor.execute('SELECT symbol FROM stocks WHERE active = 1')
     return [row[0] for row in cursor.fetchall()]
 
-def load_historical_data(symbol, conn):
-    """Load historical OHLCV data for a symbol from database."""
+def load_all_historical_data(conn):
+    """
+    Load the last HISTORY_WINDOW_DAYS of OHLCV data for every active symbol in
+    one query, ordered by symbol and date. OHLCV columns are coerced to numbers
+    and rows with a missing value dropped here, once for all symbols (a stray
+    non-numeric value left by an old ingest would otherwise turn the whole
+    column into object dtype and fail every symbol).
+    """
     query = '''
-        SELECT date, open, high, low, close, volume
+        SELECT symbol, date, open, high, low, close, volume
         FROM historical_prices
-        WHERE symbol = ?
-        ORDER BY date ASC
+        WHERE symbol IN (SELECT symbol FROM stocks WHERE active = 1)
+        AND date >= (SELECT date(MAX(date), ?) FROM historical_prices)
+        ORDER BY symbol, date ASC
     '''
-    df = pd.read_sql_query(query, conn, params=(symbol,))
-    return df
+    df = pd.read_sql_query(query, conn, params=(f'-{HISTORY_WINDOW_DAYS} days',))
+    ohlcv = ['open', 'high', 'low', 'close', 'volume']
+    df[ohlcv] = df[ohlcv].apply(pd.to_numeric, errors='coerce')
+    return df.dropna(subset=ohlcv)
 
-def calculate_and_store_indicators(symbol, conn):
+def calculate_indicators(symbol, df):
     """
-    Calculate all technical indicators for a symbol and store latest values.
+    Calculate all technical indicators for a symbol's OHLCV history (date-ordered).
+    Returns the stock_indicators row for the latest date, or None on failure.
     """
     try:
-        df = load_historical_data(symbol, conn)
-
         if df.empty or len(df) < 200:
             logging.warning(f"{symbol}: Insufficient data ({len(df)} rows, need 200+)")
-            return False
-
-        # Convert to numeric
-        df['close'] = pd.to_numeric(df['close'], errors='coerce')
-        df['high'] = pd.to_numeric(df['high'], errors='coerce')
-        df['low'] = pd.to_numeric(df['low'], errors='coerce')
-        df['open'] = pd.to_numeric(df['open'], errors='coerce')
-        df['volume'] = pd.to_numeric(df['volume'], errors='coerce')
-
-        df.dropna(subset=['close', 'high', 'low', 'open', 'volume'], inplace=True)
-
-        if len(df) < 200:
-            logging.warning(f"{symbol}: Insufficient valid data after cleanup")
-            return False
+            return None
 
         # ==================== MOMENTUM INDICATORS ====================
         df['williams_r_14'] = talib.WILLR(df['high'], df['low'], df['close'], timeperiod=14)
@@ -118,61 +179,32 @@ def calculate_and_store_indicators(symbol, conn):
         df['volume_ma_50'] = talib.SMA(df['volume'], timeperiod=50)
 
         # ==================== CUSTOM PRICE ACTION METRICS ====================
-        df['price_vs_sma20_pct'] = ((df['close'] - df['sma_20']) / df['sma_20']) * 100
-        df['price_vs_sma50_pct'] = ((df['close'] - df['sma_50']) / df['sma_50']) * 100
-        df['price_vs_sma200_pct'] = ((df['close'] - df['sma_200']) / df['sma_200']) * 100
-        df['bb_position'] = ((df['close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])) * 100
-        df['relative_volume'] = df['volume'] / df['volume_ma_20']
-        df['atr_pct'] = (df['atr_14'] / df['close']) * 100
-
-        # 52-week metrics
-        df['high_52w'] = df['high'].rolling(window=252, min_periods=1).max()
-        df['low_52w'] = df['low'].rolling(window=252, min_periods=1).min()
-        df['pct_from_52w_high'] = ((df['close'] - df['high_52w']) / df['high_52w']) * 100
-        df['pct_from_52w_low'] = ((df['close'] - df['low_52w']) / df['low_52w']) * 100
-        df['range_52w_position'] = ((df['close'] - df['low_52w']) / (df['high_52w'] - df['low_52w'])) * 100
-
-        # Historical volatility
-        df['returns'] = df['close'].pct_change()
-        df['hist_volatility_20'] = df['returns'].rolling(window=20).std() * (252 ** 0.5) * 100
-
-        # Get latest row
+        # Only the latest row is stored, so these are scalars computed from it
+        # (and, for the 52-week metrics and volatility, its trailing window)
         latest = df.iloc[-1]
+        close = latest['close']
+        price_vs_sma20_pct = ((close - latest['sma_20']) / latest['sma_20']) * 100
+        price_vs_sma50_pct = ((close - latest['sma_50']) / latest['sma_50']) * 100
+        price_vs_sma200_pct = ((close - latest['sma_200']) / latest['sma_200']) * 100
+        bb_position = ((close - latest['bb_lower']) / (latest['bb_upper'] - latest['bb_lower'])) * 100
+        relative_volume = latest['volume'] / latest['volume_ma_20']
+        atr_pct = (latest['atr_14'] / close) * 100
+
+        high_52w = df['high'].iloc[-252:].max()
+        low_52w = df['low'].iloc[-252:].min()
+        pct_from_52w_high = ((close - high_52w) / high_52w) * 100
+        pct_from_52w_low = ((close - low_52w) / low_52w) * 100
+        range_52w_position = ((close - low_52w) / (high_52w - low_52w)) * 100
+        hist_volatility_20 = df['close'].iloc[-21:].pct_change().std() * (252 ** 0.5) * 100
+
         latest_date = latest['date']
         data_age_days = (pd.Timestamp.now() - pd.to_datetime(latest_date)).days
 
         # Convert volume to Python int (from numpy int64)
         volume_value = int(latest['volume']) if pd.notna(latest['volume']) else 0
 
-        # Insert/update stock_indicators table
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO stock_indicators (
-                symbol, date, open, high, low, close, volume, data_age_days,
-                williams_r_14, williams_r_21, ema_13_williams_r, rsi_14, rsi_21,
-                macd, macd_signal, macd_hist, stoch_k, stoch_d,
-                roc_10, roc_20, cci_14, cci_20, mfi_14,
-                ema_9, ema_20, ema_50, ema_200, sma_20, sma_50, sma_200,
-                adx_14, plus_di, minus_di, sar,
-                atr_14, atr_20, bb_upper, bb_middle, bb_lower, stddev_20, bb_width, atr_pct, hist_volatility_20,
-                obv, ad, adosc, volume_ma_20, volume_ma_50, relative_volume,
-                price_vs_sma20_pct, price_vs_sma50_pct, price_vs_sma200_pct, bb_position,
-                high_52w, low_52w, pct_from_52w_high, pct_from_52w_low, range_52w_position,
-                last_calculated
-            ) VALUES (
-                ?, ?, ?, ?, ?, ?, ?, ?,
-                ?, ?, ?, ?, ?,
-                ?, ?, ?, ?, ?,
-                ?, ?, ?, ?, ?,
-                ?, ?, ?, ?, ?, ?, ?,
-                ?, ?, ?, ?,
-                ?, ?, ?, ?, ?, ?, ?, ?, ?,
-                ?, ?, ?, ?, ?, ?,
-                ?, ?, ?, ?,
-                ?, ?, ?, ?, ?,
-                ?
-            )
-        ''', (
+        # stock_indicators row (NaN/Infinity stored as NULL)
+        row = tuple(map(finite_or_none, (
             symbol, latest_date, latest['open'], latest['high'], latest['low'], latest['close'], volume_value, data_age_days,
             latest.get('williams_r_14'), latest.get('williams_r_21'), latest.get('ema_13_williams_r'),
             latest.get('rsi_14'), latest.get('rsi_21'),
@@ -184,48 +216,61 @@ def calculate_and_store_indicators(symbol, conn):
             latest.get('adx_14'), latest.get('plus_di'), latest.get('minus_di'), latest.get('sar'),
             latest.get('atr_14'), latest.get('atr_20'),
             latest.get('bb_upper'), latest.get('bb_middle'), latest.get('bb_lower'),
-            latest.get('stddev_20'), latest.get('bb_width'), latest.get('atr_pct'), latest.get('hist_volatility_20'),
+            latest.get('stddev_20'), latest.get('bb_width'), atr_pct, hist_volatility_20,
             latest.get('obv'), latest.get('ad'), latest.get('adosc'),
-            latest.get('volume_ma_20'), latest.get('volume_ma_50'), latest.get('relative_volume'),
-            latest.get('price_vs_sma20_pct'), latest.get('price_vs_sma50_pct'), latest.get('price_vs_sma200_pct'),
-            latest.get('bb_position'),
-            latest.get('high_52w'), latest.get('low_52w'),
-            latest.get('pct_from_52w_high'), latest.get('pct_from_52w_low'), latest.get('range_52w_position'),
+            latest.get('volume_ma_20'), latest.get('volume_ma_50'), relative_volume,
+            price_vs_sma20_pct, price_vs_sma50_pct, price_vs_sma200_pct, bb_position,
+            high_52w, low_52w, pct_from_52w_high, pct_from_52w_low, range_52w_position,
             datetime.now().isoformat()
-        ))
+        )))
 
-        conn.commit()
-        logging.info(f"{symbol}: Indicators calculated and stored (date: {latest_date})")
-        return True
+        logging.info(f"{symbol}: Indicators calculated (date: {latest_date})")
+        return row
 
     except Exception as e:
         logging.error(f"{symbol}: Error calculating indicators: {e}")
-        return False
+        return None
 
-def process_all_indicators(symbols, max_workers=10):
-    """Process indicators for all symbols in parallel."""
+def process_all_indicators(symbols, max_workers=None):
+    """
+    Process indicators for all symbols in parallel worker processes (the
+    pandas/TA-Lib work is CPU-bound, so threads would serialize on the GIL).
+    History is loaded in one query and split by symbol; workers get a symbol's
+    frame and return its row, which this process writes with one executemany.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
     print(f"Processing indicators for {len(symbols)} symbols...")
     print(f"Workers: {max_workers}")
     print()
 
-    # Use a connection per worker (SQLite doesn't like sharing across threads)
+    # Closed before the pool forks its workers, so no child inherits an open SQLite handle
+    conn = sqlite3.connect(DB_PATH)
+    prepare_indicator_table(conn)
+    history = load_all_historical_data(conn)
+    conn.close()
+    groups = {
+        symbol: group.drop(columns='symbol').reset_index(drop=True)
+        for symbol, group in history.groupby('symbol', sort=False)
+    }
+    del history
+    empty = pd.DataFrame(columns=['date', 'open', 'high', 'low', 'close', 'volume'])
+
     success_count = 0
     fail_count = 0
+    rows = []
 
-    def process_symbol(symbol):
-        conn = sqlite3.connect(DB_PATH)
-        result = calculate_and_store_indicators(symbol, conn)
-        conn.close()
-        return result
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(process_symbol, symbol): symbol for symbol in symbols}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(calculate_indicators, symbol, groups.get(symbol, empty)): symbol
+            for symbol in symbols
+        }
 
         for i, future in enumerate(concurrent.futures.as_completed(futures), 1):
             symbol = futures[future]
             try:
-                success = future.result()
-                if success:
+                row = future.result()
+                if row is not None:
+                    rows.append(row)
                     success_count += 1
                 else:
                     fail_count += 1
@@ -233,14 +278,23 @@ def process_all_indicators(symbols, max_workers=10):
                 if i % 50 == 0:
                     print(f"Progress: {i}/{len(symbols)} symbols processed...")
 
-                time.sleep(0.05)
-
             except Exception as e:
                 fail_count += 1
                 logging.error(f"{symbol}: Unhandled error: {e}")
 
+    conn = sqlite3.connect(DB_PATH)
+    conn.executemany(INSERT_INDICATORS_SQL, rows)
+    conn.commit()
+    conn.close()
+
     return success_count, fail_count
 
+def update_statistics():
+    """Refresh planner statistics for the API's range filters."""
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute('ANALYZE stock_indicators')
+    conn.close()
+
 def main():
     print("=" * 60)
     print("PROCESS STOCK INDICATORS")
@@ -259,7 +313,9 @@ def main():
         return
 
     start_time = time.time()
-    success, failed = process_all_indicators(symbols, max_workers=10)
+    success, failed = process_all_indicators(symbols)
+
+    update_statistics()
     elapsed = time.time() - start_time
 
     print()
@@ -2,6 +2,7 @@
 
 import pandas as pd
 import talib
+import gzip
 import json
 import os
 from datetime import datetime
@@ -17,19 +18,22 @@ logging.basicConfig(
     format='%(asctime)s %(levelname)s:%(message)s'
 )
 
+# Characters not allowed in a filename (anything but alphanumerics, '_' and '-')
+SAFE_FILENAME_RE = re.compile(r'[^\w\-]')
+
 def sanitize_filename(symbol):
     """
     Sanitizes the stock symbol to create a safe filename.
     Replaces any character that's not alphanumeric or '-' with '_'.
     """
-    return re.sub(r'[^\w\-]', '_', symbol)
+    return SAFE_FILENAME_RE.sub('_', symbol)
 
 def get_sp500_symbols(csv_path='../data/sp500_companies.csv'):
     """
     Reads the S&P 500 companies CSV and returns a list of ticker symbols.
     """
     try:
-        df = pd.read_csv(csv_path)
+        df = pd.read_csv(csv_path, usecols=['Symbol'], dtype={'Symbol': str})
         symbols = df['Symbol'].tolist()
         logging.info(f"Retrieved {len(symbols)} symbols from {csv_path}.")
         return symbols
@@ -39,14 +43,18 @@ def get_sp500_symbols(csv_path='../data/sp500_companies.csv'):
 
 def load_historical_data(symbol, input_dir='../data/stocks/historical'):
     """
-    Loads historical stock data from a JSON file.
+    Loads historical stock data from a JSON file (.json.gz, or plain .json from older fetches).
     """
     try:
         safe_symbol = sanitize_filename(symbol)
-        filename = f"{safe_symbol}.json"
-        file_path = os.path.join(input_dir, filename)
-        with open(file_path, 'r') as f:
-            data = json.load(f)
+        file_path = os.path.join(input_dir, f"{safe_symbol}.json.gz")
+        if os.path.exists(file_path):
+            with gzip.open(file_path, 'rb') as f:
+                data = json.load(f)
+        else:
+            file_path = os.path.join(input_dir, f"{safe_symbol}.json")
+            with open(file_path, 'r') as f:
+                data = json.load(f)
         logging.info(f"Loaded historical data for {symbol} from {file_path}")
         return data['Historical_Data']
     except Exception as e:
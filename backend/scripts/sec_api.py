@@ -5,9 +5,13 @@ Fetches company financial statements for Buffett formula calculations.
 """
 
 import requests
+import concurrent.futures
 import json
+import orjson
 import sqlite3
+import threading
 import time
+import zlib
 from datetime import datetime, timedelta
 import logging
 import os
@@ -19,8 +23,19 @@ logging.basicConfig(
     format='%(asctime)s %(levelname)s:%(message)s'
 )
 
+# SEC fair-access policy: at most 10 requests per second per client
+MAX_REQUESTS_PER_SECOND = 10
+
+# Cached responses are stored zlib-compressed (companyfacts JSON runs to
+# several MB per company and compresses about 10x)
+CACHE_COMPRESS_LEVEL = 3
+
 class SECAPIClient:
-    """Client for SEC EDGAR API with caching and rate limiting."""
+    """
+    Client for SEC EDGAR API with caching and rate limiting.
+    Safe to share between threads: each thread gets its own HTTP session and
+    all threads share one request-rate budget.
+    """
     
     def __init__(self, cache_db='../data/sec_cache.db', cache_ttl_days=7):
         self.base_url = "https://data.sec.gov/api/xbrl"
@@ -32,6 +47,11 @@ class SECAPIClient:
         self.cache_ttl_days = cache_ttl_days
         self._init_cache_db()
         
+        self._local = threading.local()
+        self._rate_lock = threading.Lock()
+        self._next_request_at = 0.0
+        self._mapping_lock = threading.Lock()
+        
         # Ticker to CIK mapping (S&P 500 companies)
         self.ticker_to_cik = self._load_ticker_cik_mapping()
     
@@ -59,6 +79,25 @@ class SECAPIClient:
         conn.commit()
         conn.close()
     
+    def _session(self):
+        """This thread's HTTP session (keeps connections to SEC alive between requests)."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+    
+    def _get(self, url, timeout):
+        """GET url, waiting for a slot under MAX_REQUESTS_PER_SECOND."""
+        with self._rate_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_request_at)
+            self._next_request_at = slot + 1.0 / MAX_REQUESTS_PER_SECOND
+        if slot > now:
+            time.sleep(slot - now)
+        return self._session().get(url, timeout=timeout)
+    
     def _load_ticker_cik_mapping(self):
         """Load ticker to CIK mapping from SEC or local file."""
         mapping_file = '../data/ticker_cik_mapping.json'
@@ -87,7 +126,9 @@ class SECAPIClient:
         conn.close()
         
         if row:
-            return json.loads(row[0])
+            if isinstance(row[0], bytes):
+                return orjson.loads(zlib.decompress(row[0]))
+            return json.loads(row[0])  # cached before compression was added
         return None
     
     def _cache_data(self, cik, data_type, data):
@@ -98,7 +139,8 @@ class SECAPIClient:
         cursor.execute('''
             INSERT OR REPLACE INTO sec_data (cik, data_type, fetched_at, data_json)
             VALUES (?, ?, ?, ?)
-        ''', (cik, data_type, datetime.now().isoformat(), json.dumps(data)))
+        ''', (cik, data_type, datetime.now().isoformat(),
+              zlib.compress(orjson.dumps(data), CACHE_COMPRESS_LEVEL)))
         
         conn.commit()
         conn.close()
@@ -113,7 +155,7 @@ class SECAPIClient:
         try:
             # SEC provides a company tickers endpoint
             url = "https://www.sec.gov/files/company_tickers.json"
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self._get(url, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -122,12 +164,13 @@ class SECAPIClient:
                 for key, company in data.items():
                     if company.get('ticker') == ticker.upper():
                         cik = str(company['cik_str']).zfill(10)  # Pad to 10 digits
-                        self.ticker_to_cik[ticker] = cik
                         
-                        # Save updated mapping
-                        mapping_file = '../data/ticker_cik_mapping.json'
-                        with open(mapping_file, 'w') as f:
-                            json.dump(self.ticker_to_cik, f, indent=2)
+                        # Save updated mapping (one writer at a time)
+                        with self._mapping_lock:
+                            self.ticker_to_cik[ticker] = cik
+                            mapping_file = '../data/ticker_cik_mapping.json'
+                            with open(mapping_file, 'w') as f:
+                                json.dump(self.ticker_to_cik, f, indent=2)
                         
                         return cik
         except Exception as e:
@@ -180,7 +223,7 @@ class SECAPIClient:
             url = f"{self.base_url}/companyfacts/CIK{cik}.json"
             logging.info(f"Fetching SEC data for {ticker} from {url}")
             
-            response = requests.get(url, headers=self.headers, timeout=30)
+            response = self._get(url, timeout=30)
             response.raise_for_status()
             
             data = response.json()
@@ -195,6 +238,23 @@ class SECAPIClient:
             logging.error(f"Error fetching SEC data for {ticker}: {e}")
             return None
     
+    def _fetch_company_facts_safe(self, ticker):
+        """fetch_company_facts for a worker thread: errors are logged and become None."""
+        try:
+            return self.fetch_company_facts(ticker)
+        except Exception as e:
+            logging.error(f"Error fetching SEC data for {ticker}: {e}")
+            return None
+    
+    def fetch_company_facts_bulk(self, tickers, max_workers=8):
+        """
+        Fetch company facts for many tickers concurrently.
+        Requests still share the MAX_REQUESTS_PER_SECOND budget.
+        Returns: dict of ticker -> company facts (None where the fetch failed).
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(tickers, executor.map(self._fetch_company_facts_safe, tickers)))
+    
     def fetch_submissions(self, ticker):
         """Fetch company submissions (10-K, 10-Q filings)."""
         cik = self.resolve_ticker_to_cik(ticker)
@@ -209,7 +269,7 @@ class SECAPIClient:
         # Fetch from SEC API
         try:
             url = f"{self.base_url}/submissions/CIK{cik}.json"
-            response = requests.get(url, headers=self.headers, timeout=30)
+            response = self._get(url, timeout=30)
             response.raise_for_status()
             
             data = response.json()
@@ -38,6 +38,20 @@ def test_stock_all_data():
     except Exception as e:
         print(f"Exception during request: {e}")
 
+def test_gzip_etag_revalidates():
+    client = app.test_client()
+    url = '/api/config/indicators'
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    tag = etag.replace('W/', '').strip('"')
+
+    # The gzip tag as sent, and as suffixed by proxies, both revalidate
+    for if_none_match in (etag, f'W/"{tag}-gzip"', f'"{tag}"'):
+        assert client.get(url, headers={'If-None-Match': if_none_match}).status_code == 304
+    assert client.get(url, headers={'If-None-Match': '"other"'}).status_code == 200
+
 if __name__ == "__main__":
     # Disable logging to keep output clean
     logging.disable(logging.CRITICAL)
@@ -0,0 +1,70 @@
+import sys
+import os
+import random
+
+import numpy as np
+
+# Add the scripts directory to path so we can import buffett_formulas
+sys.path.append(os.path.join(os.path.dirname(__file__), '../scripts'))
+
+from buffett_formulas import BuffettFormulaEngine, BatchBuffettEngine, FormulaStatus, FORMULA_FACTS, run_all
+
+
+def make_facts(count=500, seed=42):
+    """Random fact dicts, including missing facts and zero denominators."""
+    rng = random.Random(seed)
+    facts = []
+    for _ in range(count):
+        company = {}
+        for name in BatchBuffettEngine.FACTS:
+            r = rng.random()
+            if r < 0.1:
+                continue
+            company[name] = 0 if r < 0.2 else rng.uniform(-1e9, 5e9)
+        facts.append(company)
+    return facts
+
+
+def test_batch_matches_scalar_engine():
+    facts = make_facts()
+    values, passed = BatchBuffettEngine.from_fact_dicts(facts).evaluate_all_batch()
+
+    for i, company in enumerate(facts):
+        results = BuffettFormulaEngine(company).evaluate_all()
+        assert [r.status == FormulaStatus.PASS for r in results] == passed[i].tolist()
+        assert np.allclose([r.value for r in results], values[i])
+
+
+def test_pass_counts():
+    facts = make_facts(50)
+    counts = BatchBuffettEngine.from_fact_dicts(facts).pass_counts()
+    expected = [
+        sum(r.status == FormulaStatus.PASS for r in BuffettFormulaEngine(company).evaluate_all())
+        for company in facts
+    ]
+    assert counts.tolist() == expected
+
+
+def test_compiled_kernel_matches_numpy():
+    engine = BatchBuffettEngine.from_fact_dicts(make_facts(200))
+    values, passed = engine._evaluate_compiled()
+    expected_values, expected_passed = engine._evaluate_numpy()
+    assert np.array_equal(passed, expected_passed)
+    assert np.allclose(values, expected_values)
+
+
+def test_run_all_matches_engine():
+    for company in make_facts(200):
+        results = BuffettFormulaEngine(company).evaluate_all()
+        pure = run_all(tuple(company.get(name, 0) for name in FORMULA_FACTS))
+        assert [passed for passed, _ in pure] == [r.status == FormulaStatus.PASS for r in results]
+        assert [value for _, value in pure] == [r.value for r in results]
+
+
+def test_float32_batch_matches_float64():
+    facts = make_facts()
+    values64, passed64 = BatchBuffettEngine.from_fact_dicts(facts).evaluate_all_batch()
+    values32, passed32 = BatchBuffettEngine.from_fact_dicts(facts, dtype=np.float32).evaluate_all_batch()
+    assert values32.dtype == np.float32
+    assert np.array_equal(passed32, passed64)
+    assert np.allclose(values32, values64, rtol=1e-5)
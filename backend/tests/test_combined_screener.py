@@ -0,0 +1,90 @@
+import sys
+import os
+import random
+
+import pandas as pd
+
+# Add the scripts directory to path so we can import combined_screener
+sys.path.append(os.path.join(os.path.dirname(__file__), '../scripts'))
+
+import combined_screener
+from combined_screener import CombinedScreener
+
+# Passes all 10 formulas
+PERFECT_FACTS = {
+    'Assets': 100, 'CurrentAssets': 50, 'Liabilities': 10, 'CurrentLiabilities': 10,
+    'TotalDebt': 10, 'Equity': 100, 'CashAndEquivalents': 50, 'ShortTermInvestments': 0,
+    'Revenue': 100, 'OperatingIncome': 50, 'NetIncome': 30, 'InterestExpense': 1,
+    'FreeCashFlow': 20
+}
+
+
+class FakeSECClient:
+    """Serves fixed fact dicts and records which tickers were fetched."""
+
+    def __init__(self, facts):
+        self.facts = facts
+        self.fetched = []
+
+    def fetch_company_facts_bulk(self, tickers, max_workers=8):
+        self.fetched.extend(tickers)
+        return {ticker: {'ticker': ticker} for ticker in tickers}
+
+    def extract_financial_facts(self, companyfacts):
+        ticker = companyfacts['ticker']
+        return {'entityName': ticker, 'facts': self.facts[ticker]}
+
+
+def make_universe(count=400, seed=7):
+    """Oversold rows and per-ticker facts: a mix of perfect and random companies."""
+    rng = random.Random(seed)
+    rows, facts = [], {}
+    for i in range(count):
+        symbol = f"S{i:03d}"
+        rows.append({
+            'symbol': symbol, 'close': 100.0,
+            'williams_r_21': rng.choice([-100.0, -95.0, rng.uniform(-100, -80)]),
+            'ema_13_williams_r': -85.0, 'rsi_14': rng.uniform(10, 60), 'rsi_21': 35.0,
+            'adx_14': 20.0, 'price_vs_sma200_pct': -10.0, 'pct_from_52w_high': -30.0,
+            'pct_from_52w_low': rng.uniform(0, 40), 'bb_position': rng.uniform(0, 40),
+            'relative_volume': rng.uniform(0.5, 2.5), 'macd_hist': -0.1, 'volume': 1000,
+            'hist_volatility_20': 25.0, 'data_age_days': 0
+        })
+        if rng.random() < 0.3:
+            facts[symbol] = PERFECT_FACTS
+        else:
+            facts[symbol] = {name: rng.uniform(-50, 150) for name in PERFECT_FACTS}
+    return pd.DataFrame(rows), facts
+
+
+def make_screener(df, facts, min_buffett_score):
+    screener = CombinedScreener.__new__(CombinedScreener)
+    screener.sec_client = FakeSECClient(facts)
+    screener.min_buffett_score = min_buffett_score
+    screener.technical_threshold = -80.0
+    screener.max_workers = 1
+    screener.get_oversold_stocks = lambda: df.copy()
+    return screener
+
+
+def ranking(stocks):
+    return [(s['ticker'], s['scores']['combined']) for s in stocks]
+
+
+def test_batched_fundamentals_keep_top_n(monkeypatch):
+    df, facts = make_universe()
+    for min_buffett_score in (0, 5):
+        for top_n in (1, 5, 20):
+            # Reference: fundamentals for every oversold stock in one batch
+            monkeypatch.setattr(combined_screener, 'MIN_SHORTLIST', len(df))
+            monkeypatch.setattr(combined_screener, 'SHORTLIST_FACTOR', 1)
+            full = make_screener(df, facts, min_buffett_score)
+            expected = ranking(full.screen_stocks(top_n))
+
+            monkeypatch.setattr(combined_screener, 'MIN_SHORTLIST', 10)
+            batched = make_screener(df, facts, min_buffett_score)
+            assert ranking(batched.screen_stocks(top_n)) == expected
+            assert len(full.sec_client.fetched) == len(df)
+
+    # The early stop actually kicks in for this universe
+    assert len(batched.sec_client.fetched) < len(df)
@@ -0,0 +1,45 @@
+import sys
+import os
+
+# Add the api directory to path so we can import app
+sys.path.append(os.path.join(os.path.dirname(__file__), '../api'))
+
+from app import build_stock_query
+
+
+def test_filters_are_bound_as_parameters():
+    query, params = build_stock_query(
+        filters={'RSI_14': {'from': 30, 'to': 70}, 'ADX_14': {'from': 25}},
+        max_age=1,
+        sort_by='RSI_14',
+        sort_order='desc',
+        limit=10
+    )
+    assert "data_age_days <= ?" in query
+    assert "adx_14 >= ?" in query
+    assert "rsi_14 BETWEEN ? AND ?" in query
+    assert query.endswith("ORDER BY rsi_14 DESC LIMIT ?")
+    assert params == [1, 25, 30, 70, 10]
+
+
+def test_same_shape_reuses_sql_text():
+    first, _ = build_stock_query(filters={'RSI_14': {'from': 30}})
+    second, params = build_stock_query(filters={'RSI_14': {'from': 45}})
+    assert first is second
+    assert params == [45]
+
+
+def test_unknown_field_is_rejected():
+    try:
+        build_stock_query(filters={'rsi_14 >= 0 OR 1': {'from': 1}})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown filter field was accepted")
+
+    try:
+        build_stock_query(sort_by='symbol; DROP TABLE stocks')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown sort field was accepted")